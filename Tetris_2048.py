@@ -1,37 +1,49 @@
 import stddraw  # the stddraw module is used as a basic graphics library
-import random  # used for creating tetrominoes with random types/shapes
 from game_grid import GameGrid  # class for modeling the game grid
 from tetromino import Tetromino  # class for modeling the tetrominoes
+from engine import PieceGenerator  # used for creating the tetrominoes from a seed
+from engine import fall_interval  # used for the speed of the tetrominoes
+from replay import Replay  # used for recording the game
+import autoplayer  # used for playing the game automatically
 from picture import Picture  # used representing images to display
 import os  # used for file and directory operations
+import sys  # used for the command line arguments
 from color import Color  # used for coloring the game menu
-from time import perf_counter
-import keyboard
+from game_clock import GameClock  # used for the timing of the game loop
+from concurrent.futures import ProcessPoolExecutor  # used for planning the autoplayer moves
 import time
-import copy as cp
 # MAIN FUNCTION OF THE PROGRAM
 # -------------------------------------------------------------------------------
 # Main function where this program starts execution
 SCORE = 0
 CLEARED = 0
 COMBINED = 0
-PAUSE_COUNTER = 0
 GAME_OVER = False  # added in order to restart the game properly
 DEBUG = False
 DEBUG_2 = False
+AUTOPLAY = False  # the autoplayer types the keys when it is True
 
 
-def start():
+# The tetrominoes are created from the given seed (a random seed if it is None)
+# and the game is recorded to the replay file with the given path (if any). The
+# game logic runs at tick_rate ticks per second, and at most max_ticks_per_frame
+# ticks (the frame budget) are run before each of the frames that are displayed
+# at frame_rate frames per second.
+def start(seed=None, record_path=None, tick_rate=60, frame_rate=60,
+          max_ticks_per_frame=5):
     global SCORE
     global CLEARED
     global COMBINED
-    global PAUSE_COUNTER
     global GAME_OVER
     global DEBUG
     global DEBUG_2
-    # Timer for block downfall
-    timer_start = -999
+    global AUTOPLAY
+    # Timer for block downfall (the time passed since the tetromino last moved
+    # down, which is high at first so that the first tetromino moves at once)
+    fall_time = 999
     game_speed = 0.5  # In seconds
+    effect_speed = 1  # how many times faster the clear and merge effects are shown
+    clock = GameClock(tick_rate, frame_rate, max_ticks_per_frame)
     # set the dimensions of the game grid
     grid_h, grid_w = 20, 12
     # set the size of the drawing canvas
@@ -43,10 +55,26 @@ def start():
 
     # create the game grid
     grid = GameGrid(grid_h, grid_w)
+    grid.animation.speed = effect_speed
+    # the generator of the types, the positions and the tile numbers of the
+    # tetrominoes (the same seed gives the same tetrominoes in the same order)
+    generator = PieceGenerator(seed, grid_w)
+    # the keys typed on each tick are recorded with the seed of the generator,
+    # so that the game can be played back on the engine (see replay.py)
+    recorder = Replay(generator.seed, grid_h, grid_w, tick_rate, game_speed)
+    # the number of the logic ticks run since the game has started
+    tick_count = 0
+    # the autoplayer (toggled by typing a), which plans in a process of its own
+    # so that its search does not stall the game loop, the plan in progress
+    # (None if there is none), the tetromino that it has last planned for and
+    # the keys that it has chosen for this tetromino
+    planner = ProcessPoolExecutor(max_workers=1, initializer=autoplayer.init_planner,
+                                  initargs=(0.5,))
+    plan, planned_tetromino, autoplay_keys = None, None, []
     # create the first tetromino to enter the game grid
     # by using the create_tetromino function defined below
-    current_tetromino = create_tetromino(grid_h, grid_w, grid, DEBUG)
-    next_tetromino = create_tetromino(grid_h, grid_w, grid, DEBUG)
+    current_tetromino = create_tetromino(grid_h, grid_w, generator, DEBUG)
+    next_tetromino = create_tetromino(grid_h, grid_w, generator, DEBUG)
     grid.current_tetromino = current_tetromino
     grid.next_tetromino = next_tetromino
 
@@ -55,171 +83,216 @@ def start():
     stddraw.setXscale(-0.5, grid_w + 2.5)
     stddraw.setYscale(-0.5, grid_h - 0.5)
 
-    while True:
-        while not GAME_OVER:  # main game
-            # check user interactions via the keyboard
-            if stddraw.hasNextKeyTyped():
-                key_typed = stddraw.nextKeyTyped()
-                # if the left arrow key has been pressed
-                if key_typed == "left":
-                    # move the tetromino left by one
-                    current_tetromino.move(key_typed, grid)
-                    # if the right arrow key has been pressed
-                elif key_typed == "right":
-                    # move the tetromino right by one
-                    current_tetromino.move(key_typed, grid)
-                # if the down arrow key has been pressed
-                elif key_typed == "down":
-                    # move the tetromino down by one
-                    # (causes the tetromino to fall down faster)
-                    current_tetromino.move(key_typed, grid)
-                elif key_typed == "space":
-                    for _ in range(24):
-                        current_tetromino.move('down', grid)
-                        success = False  # Don't allow for any movement after pressing space
-                    grid.display(SCORE)
-                elif key_typed == "up":
-                    current_tetromino.rotate(grid)
+    # the recorded game is saved when the program exits (also when the window
+    # is closed during the game)
+    try:
+        while True:
+            while not GAME_OVER:  # main game
+                # run the game logic for the ticks that are due since the last frame
+                for tick in range(clock.ticks()):
+                    tick_count += 1
+                    # the autoplayer chooses the placement of each new
+                    # tetromino on a copy of the grid while the game goes on,
+                    # and then the keys that take the tetromino there from
+                    # where it is (the plans for the old tetrominoes are
+                    # dropped)
+                    if AUTOPLAY:
+                        if plan is not None and plan.done():
+                            if planned_tetromino is current_tetromino:
+                                autoplay_keys = autoplayer.grid_keys(grid, plan.result())
+                            plan = None
+                        if plan is None and planned_tetromino is not current_tetromino:
+                            plan = planner.submit(autoplayer.choose_placement,
+                                                  *autoplayer.grid_state(grid))
+                            planned_tetromino, autoplay_keys = current_tetromino, []
+                    # check user interactions via the keyboard (or type the
+                    # next key of the autoplayer, one key per tick)
+                    key_typed = None
+                    if stddraw.hasNextKeyTyped():
+                        key_typed = stddraw.nextKeyTyped()
+                    elif AUTOPLAY and autoplay_keys:
+                        key_typed = autoplay_keys.pop(0)
+                    if key_typed is not None:
+                        # (y is recorded only when it is typed on the game over screen)
+                        if key_typed != "y":
+                            recorder.add(tick_count, key_typed)
+                        # if the left arrow key has been pressed
+                        if key_typed == "left":
+                            # move the tetromino left by one
+                            current_tetromino.move(key_typed, grid)
+                            # if the right arrow key has been pressed
+                        elif key_typed == "right":
+                            # move the tetromino right by one
+                            current_tetromino.move(key_typed, grid)
+                        # if the down arrow key has been pressed
+                        elif key_typed == "down":
+                            # move the tetromino down by one
+                            # (causes the tetromino to fall down faster)
+                            current_tetromino.move(key_typed, grid)
+                        elif key_typed == "space":
+                            current_tetromino.hard_drop(grid)
+                            success = False  # Don't allow for any movement after pressing space
+                        elif key_typed == "up":
+                            current_tetromino.rotate(grid)
 
-                # pause
-                elif key_typed == "p":
-                    PAUSE_COUNTER = PAUSE_COUNTER + 1
-                    if PAUSE_COUNTER % 2 == 1:
-                        grid.display(SCORE, game_over=False, paused=True)
-                        keyboard.wait("p")
+                        # pause
+                        elif key_typed == "p":
+                            grid.display(SCORE, game_over=False, paused=True)
+                            # sleep until p is typed again to continue the game
+                            stddraw.waitForKeyTyped(["p"])
+                            # the paused time is not run as logic ticks
+                            clock.reset()
 
-                # restart
-                elif key_typed == "r":
-                    current_tetromino.clear_tetro(grid)
-                    grid.clear_everything(grid_w, grid_h)
-                    SCORE = 0
-                    CLEARED = 0
-                    COMBINED = 0
-                    DEBUG = False
-                    DEBUG_2 = False
-                    success = False
+                        # restart
+                        elif key_typed == "r":
+                            current_tetromino.clear_tetro(grid)
+                            grid.clear_everything(grid_w, grid_h)
+                            SCORE = 0
+                            CLEARED = 0
+                            COMBINED = 0
+                            DEBUG = False
+                            DEBUG_2 = False
+                            success = False
+                            planned_tetromino = None
 
-                # hold
-                elif key_typed == "c":
-                    pass
-                    # swap
-                    # current_tetromino, next_tetromino = next_tetromino, current_tetromino
-                    # temp = current_tetromino
-                    # current_tetromino = next_tetromino
-                    # next_tetromino = temp
-                    #
-                    #
+                        # skip the clear and merge effects that are being shown
+                        elif key_typed == "x":
+                            grid.animation.skip()
 
-                # debug mode
-                elif key_typed == "i":
-                    DEBUG = True
+                        # hold
+                        elif key_typed == "c":
+                            pass
+                            # swap
+                            # current_tetromino, next_tetromino = next_tetromino, current_tetromino
+                            # temp = current_tetromino
+                            # current_tetromino = next_tetromino
+                            # next_tetromino = temp
+                            #
+                            #
 
-                # debug mode #2
-                elif key_typed == "b":
-                    DEBUG_2 = True
+                        # debug mode
+                        elif key_typed == "i":
+                            DEBUG = True
 
-                # normal mode
-                elif key_typed == "n":
-                    DEBUG = False
-                    DEBUG_2 = False
+                        # debug mode #2
+                        elif key_typed == "b":
+                            DEBUG_2 = True
 
-                # clear the queue that stores all the keys pressed/typed
-                stddraw.clearKeysTyped()
+                        # normal mode
+                        elif key_typed == "n":
+                            DEBUG = False
+                            DEBUG_2 = False
 
-            # Ghost Guide
-            grid.ghost_tetromino = cp.deepcopy(current_tetromino)
-            for i in range(24):
-                grid.ghost_tetromino.move("down", grid)
+                        # autoplay (the keys of the autoplayer are recorded
+                        # as typed keys, so the replays do not need it)
+                        elif key_typed == "a":
+                            AUTOPLAY = not AUTOPLAY
+                            autoplay_keys, planned_tetromino = [], None
 
-            # move (drop) the tetromino down by 1 after set amount of time
-            end_time = perf_counter()
-            if end_time - timer_start >= clamp(game_speed - (SCORE / 150) * 0.025, 0.11, 5):
-                success = current_tetromino.move("down", grid)
-                timer_start = perf_counter()
+                        # clear the queue that stores all the keys pressed/typed
+                        stddraw.clearKeysTyped()
 
-            # place the tetromino on the game grid when it cannot go down anymore
-            if not success:
-                # get the tile matrix of the tetromino
-                tiles_to_place = current_tetromino.tile_matrix
-                # update the game grid by adding the tiles of the tetromino
-                game_over = grid.update_grid(tiles_to_place)
-                #  score for combining tiles
-                # COMBINED += grid.clear_2048(grid_w, grid_h)
-                # to_add = grid.delete_floating()
-                # SCORE += to_add
-                while True:
-                    cleared_2048 = 0
-                    cleared_2048 += grid.clear_2048(grid_w, grid_h)
-                    COMBINED += cleared_2048
-                    cleared = grid.clear(grid_w, grid_h)
-                    CLEARED += cleared
-                    COMBINED += grid.delete_floating()
-                    if cleared + cleared_2048 == 0:
-                        break
-                if game_over:
-                    # breaking game's while loop
-                    GAME_OVER = True
-                    break
-                # create the next tetromino to enter the game grid
-                # by using the create_tetromino function defined below
-                current_tetromino = create_tetromino(grid_h, grid_w, grid, DEBUG, DEBUG_2)
-                grid.current_tetromino = current_tetromino
+                    # move (drop) the tetromino down by 1 after set amount of time
+                    fall_time += clock.tick_duration
+                    if fall_time >= fall_interval(SCORE, game_speed):
+                        success = current_tetromino.move("down", grid)
+                        fall_time = 0
 
-                # next tetromino
-                #
-                # current_tetromino = next_tetromino
-                # next_tetromino = create_tetromino(grid_h, grid_w, grid)
-                # grid.current_tetromino = current_tetromino
+                    # place the tetromino on the game grid when it cannot go down anymore
+                    if not success:
+                        # get the tile matrix of the tetromino
+                        tiles_to_place = current_tetromino.tile_matrix
+                        # update the game grid by adding the tiles of the tetromino
+                        game_over = grid.update_grid(tiles_to_place)
+                        #  score for combining tiles
+                        # COMBINED += grid.clear_2048()
+                        # to_add = grid.delete_floating()
+                        # SCORE += to_add
+                        while True:
+                            cleared_2048 = 0
+                            cleared_2048 += grid.clear_2048()
+                            COMBINED += cleared_2048
+                            cleared = grid.clear()
+                            CLEARED += cleared
+                            COMBINED += grid.delete_floating()
+                            if cleared + cleared_2048 == 0:
+                                break
+                        if game_over:
+                            # breaking game's while loop
+                            GAME_OVER = True
+                            break
+                        # the next tetromino enters the game grid and a new next
+                        # tetromino is created by using the create_tetromino function
+                        # defined below (in the same order as the engine does)
+                        current_tetromino = next_tetromino
+                        next_tetromino = create_tetromino(grid_h, grid_w, generator,
+                                                          DEBUG, DEBUG_2)
+                        grid.current_tetromino = current_tetromino
+                        grid.next_tetromino = next_tetromino
 
-                # After spawning move the block once and update success or instant game over
-                success = current_tetromino.move("down", grid)
+                        # After spawning move the block once and update success or instant game over
+                        success = current_tetromino.move("down", grid)
 
-            SCORE = CLEARED * 100 + COMBINED
-            # display the game grid and as well the current tetromino
-            # grid.clear(grid_w, grid_h)
-            # default display with score
-            grid.display(SCORE)
-        # game over screen
-        grid.display(SCORE, GAME_OVER)
+                    SCORE = CLEARED * 100 + COMBINED
+                # display the game grid and as well the current tetromino
+                # grid.clear()
+                # default display with score
+                grid.display(SCORE)
+                # wait until the next frame is due
+                clock.wait_frame()
+            # game over screen (shown after the effects that are not shown yet)
+            grid.animation.skip()
+            grid.display(SCORE, GAME_OVER)
+            # sleep until y (continue) or n (exit) is typed
+            key_typed = stddraw.waitForKeyTyped(["y", "n"])
+            recorder.add(tick_count, key_typed)
 
-        # main game loop (keyboard interaction for moving the tetromino)
-        if keyboard.is_pressed("y"):
-            current_tetromino.clear_tetro(grid)
-            grid.clear_everything(grid_w, grid_h)
-            SCORE = 0
-            CLEARED = 0
-            COMBINED = 0
-            GAME_OVER = False
-            DEBUG = False
-            DEBUG_2 = False
-            grid = GameGrid(grid_h, grid_w)
-            current_tetromino = create_tetromino(grid_h, grid_w, grid)
-            grid.current_tetromino = current_tetromino
-            success = current_tetromino.move("down", grid)
+            # main game loop (keyboard interaction for moving the tetromino)
+            if key_typed == "y":
+                current_tetromino.clear_tetro(grid)
+                grid.clear_everything(grid_w, grid_h)
+                SCORE = 0
+                CLEARED = 0
+                COMBINED = 0
+                GAME_OVER = False
+                DEBUG = False
+                DEBUG_2 = False
+                grid = GameGrid(grid_h, grid_w)
+                grid.animation.speed = effect_speed
+                current_tetromino = next_tetromino
+                next_tetromino = create_tetromino(grid_h, grid_w, generator)
+                grid.current_tetromino = current_tetromino
+                grid.next_tetromino = next_tetromino
+                success = current_tetromino.move("down", grid)
+                clock.reset()
 
-        elif keyboard.is_pressed("n"):
-            break
+            else:
+                break
+    finally:
+        planner.shutdown(cancel_futures=True)
+        if record_path is not None:
+            recorder.ticks = tick_count
+            recorder.save(record_path)
 
     print(SCORE)
     print("Game over")
 
 
 # Function for creating random shaped tetrominoes to enter the game grid
-def create_tetromino(grid_height, grid_width, grid, debug=False, debug2=False):
+def create_tetromino(grid_height, grid_width, generator, debug=False, debug2=False):
+    # the type (shape), the horizontal position and the tile numbers of the
+    # tetromino are determined randomly by the generator
+    random_type, x, exponents = generator.next_piece()
     # DEBUG VALUES
     if debug or debug2:
-        tetromino_types = ['I']
-    else:
-        # type (shape) of the tetromino is determined randomly
-        tetromino_types = ['I', 'O', 'Z', 'S', 'L', 'J', 'T']
-    random_index = random.randint(0, len(tetromino_types) - 1)
-    random_type = tetromino_types[random_index]
+        random_type = 'I'
+        x = min(x, grid_width - 4)
     # create and return the tetromino
-    tetromino = Tetromino(random_type, grid_height, grid_width)
+    tetromino = Tetromino(random_type, grid_height, grid_width, x)
+    # (all the tiles of the debug mode 2 are 512s)
     if debug2:
-        tetromino.set_random_tile_numbers(grid, debug2)
-    else:
-        tetromino.set_random_tile_numbers(grid)
+        exponents = [9] * len(tetromino.tiles)
+    tetromino.set_tile_numbers(exponents)
     return tetromino
 
 
@@ -268,11 +341,8 @@ def display_game_menu(grid_height, grid_width):
                     break  # break the loop to end the method and start the game
 
 
-def clamp(n, minn, maxn):
-    return max(min(maxn, n), minn)
-
-
 # start() function is specified as the entry point (main function) from which
 # the program starts execution
+# (the game is recorded to the replay file given as the command line argument)
 if __name__ == '__main__':
-    start()
+    start(record_path=sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,47 @@
+import time  # used for timing the steps of the animations
+from collections import deque  # used as the queue of the animation steps
+
+
+# Class used for showing the effects of clearing the rows and merging the tiles
+# frame by frame, so that the game goes on (reading the keys, moving the
+# tetromino and displaying the frames) while the effects are shown
+class Animation:
+    # Constructor that creates an animation with no steps to show
+    def __init__(self, speed=1):
+        # queue of the steps to show, where each step is given as its duration
+        # in ms, the value matrix to show in place of the game grid and the
+        # (row, col) cells on which the tiles are shown as cleared
+        self.steps = deque()
+        # how many times faster than their durations the steps are shown
+        self.speed = speed
+        # the time when the first step in the queue has started to be shown
+        # (None until the step is shown)
+        self.step_start = None
+
+    # Method for adding a step to the end of the animation
+    def add(self, duration, value_matrix, cleared_cells=()):
+        self.steps.append((duration, value_matrix, tuple(cleared_cells)))
+
+    # Method that returns the step to show at the given time (or now) as a
+    # (duration, value_matrix, cleared_cells) tuple, or None if all the steps
+    # have been shown
+    def current_step(self, now=None):
+        if now is None:
+            now = time.perf_counter()
+        while self.steps:
+            if self.step_start is None:
+                self.step_start = now
+            duration = self.steps[0][0] / 1000 / self.speed
+            if now - self.step_start < duration:
+                return self.steps[0]
+            # the next step starts when the previous one ends, so that the
+            # animation is not slowed down by the frames that come late
+            self.steps.popleft()
+            self.step_start += duration
+        self.step_start = None
+        return None
+
+    # Method for skipping all the steps that are not shown yet
+    def skip(self):
+        self.steps.clear()
+        self.step_start = None
@@ -0,0 +1,630 @@
+import random  # used for sampling the tile numbers of the unknown pieces
+import itertools  # used for the tile number patterns of the unknown pieces
+import time  # used for the time budget of each move
+from collections import OrderedDict  # used for the transposition table
+import numpy as np  # used for the boards of the searched placements
+from engine import ROTATION_TABLES, TYPES, Piece, connected_rows, find_placements  # game logic
+
+# The autoplayer module is a built-in player that chooses where to place the
+# current piece with an expectimax search. The search looks at the placements
+# of the current piece, then of the known next piece, and then takes the
+# average over the pieces that may come after them. PieceGenerator gives each
+# type with 16 equally likely patterns of the tile numbers 2 and 4, and the
+# average is taken over a sample of these patterns for each type (the exact
+# expectation over all the patterns is 8 times slower, see tile_patterns). Only
+# the best placements of each piece are searched deeper (a beam search), the
+# boards are scored by their features (see evaluate), and the values of the
+# searched boards are kept in a transposition table by their Zobrist hashes.
+# The search is deepened one piece at a time while the time budget of the move
+# lasts. The placements are tried on the value matrix as lists (see expand and
+# resolve_rows), since NumPy is slow for the small steps of a single placement.
+
+# value of the placements that end the game
+LOSS = -10 ** 9
+# weights of the features of a board (see evaluate)
+WEIGHTS = {'holes': -40, 'height': -4, 'bumpiness': -2, 'merges': 6}
+
+
+# Function that returns the features of a board given by the rows of its value
+# matrix (as lists): the number of its holes (empty cells below the top of their
+# columns), its column heights, the number of the columns whose top tile can
+# merge with a new tile (a 2 or a 4) and the number of the tiles that merge with
+# the tile above them after it merges once (e.g. a 4 below a 2)
+def row_features(rows):
+    # (the exponents are bytes, and the empty cells above the top tile of a
+    # column are stripped from its end)
+    heights = [len(bytes(column).rstrip(b'\0')) for column in zip(*rows)]
+    tiles = sum(len(row) - row.count(0) for row in rows)
+    small_tops = sum(1 for x, height in enumerate(heights)
+                     if height and rows[height - 1][x] <= 2)
+    stack = rows[:max(heights)]
+    chains = sum(1 for lower, upper in zip(stack, stack[1:])
+                 for a, b in zip(lower, upper) if b and a == b + 1)
+    return sum(heights) - tiles, heights, small_tops, chains
+
+
+# Function that returns the value of the given features of a board: the
+# penalties for the holes, the height of the stack and its bumpiness (the height
+# differences of the adjacent columns), and the bonus for the merge potential
+# (the top tiles and the chains that can merge)
+def feature_value(holes, heights, small_tops, chains, weights=WEIGHTS):
+    bumpiness = sum(abs(a - b) for a, b in zip(heights, heights[1:]))
+    return (weights['holes'] * holes + weights['height'] * max(heights) +
+            weights['bumpiness'] * bumpiness + weights['merges'] * (small_tops + chains))
+
+
+# Function that returns the value of a board from its features
+def evaluate(board, weights=WEIGHTS):
+    return feature_value(*row_features(board.value_matrix.tolist()), weights)
+
+
+# Function that returns the features (see row_features) of a board after the
+# tiles given as {(x, y): exponent} are placed on it, from the rows of its value
+# matrix, its features and the number of the tiles on each of its rows, without
+# changing or copying the rows. Returns LOSS if a tile is out of the board, and
+# None if a tile would merge or a row would be full (then the board must be
+# resolved after the placement, see resolve_rows).
+def placed_features(rows, features, row_counts, cells):
+    holes, heights, small_tops, chains = features
+    h, w = len(rows), len(rows[0])
+    if any(y >= h for x, y in cells):
+        return LOSS
+    new_heights = list(heights)
+    # the exponent of the new top tile of each column and the number of the
+    # tiles placed on each row
+    tops, filled = {}, {}
+    for (x, y), exponent in cells.items():
+        below = cells.get((x, y - 1)) or (rows[y - 1][x] if y > 0 else 0)
+        if below == exponent:
+            return None
+        if below == exponent + 1:
+            chains += 1
+        # (a chain with a placed tile above is counted for that tile)
+        above = cells.get((x, y + 1))
+        if above is None:
+            above = rows[y + 1][x] if y + 1 < h else 0
+            if above != 0 and exponent == above + 1:
+                chains += 1
+        if above == exponent:
+            return None
+        filled[y] = filled.get(y, 0) + 1
+        if y + 1 > new_heights[x]:
+            new_heights[x] = y + 1
+            tops[x] = exponent
+    for y, n in filled.items():
+        if row_counts[y] + n == w:
+            return None
+    for x, exponent in tops.items():
+        if heights[x] > 0 and rows[heights[x] - 1][x] <= 2:
+            small_tops -= 1
+        if exponent <= 2:
+            small_tops += 1
+    holes += sum(new_heights) - sum(heights) - len(cells)
+    return holes, new_heights, small_tops, chains
+
+
+# Function for merging, clearing and deleting the floating tiles on the given
+# rows of a value matrix (as lists) until nothing changes, as Board.resolve does
+# on the value matrix of a board (but without the NumPy overhead of the small
+# steps). Only the given columns can have pairs to merge at first (e.g. the
+# columns of a piece placed on a resolved board). Returns the number of the
+# cleared rows and the sum of the numbers on the merged and the deleted tiles.
+def resolve_rows(rows, columns):
+    h, w = len(rows), len(rows[0])
+    total_cleared, total_combined = 0, 0
+    while True:
+        # merge the lowest pair of each column until no pair is left (as
+        # Board.merge_columns)
+        combined = 0
+        for x in columns:
+            column = [row[x] for row in rows]
+            merged = False
+            # (the pairs are below the top tile of the column)
+            top = len(bytes(column).rstrip(b'\0'))
+            y = 0
+            while y < top - 1:
+                exponent = column[y]
+                if exponent == 0 or exponent != column[y + 1]:
+                    y += 1
+                    continue
+                column[y] = exponent + 1
+                combined += 1 << (exponent + 1)
+                merged = True
+                # the tiles above the pair (except the topmost one) go down
+                if y == h - 2:
+                    column[h - 1] = 0
+                else:
+                    column[y + 1:h - 2] = column[y + 2:h - 1]
+                    column[h - 2] = 0
+                # the merged tile may form a pair with the tile below it
+                y = max(y - 1, 0)
+            if merged:
+                for row, exponent in zip(rows, column):
+                    row[x] = exponent
+        total_combined += combined
+        # clear the full rows (as Board.clear)
+        remaining = [row for row in rows if 0 in row]
+        cleared = h - len(remaining)
+        if cleared:
+            rows[:] = remaining + [[0] * w for i in range(cleared)]
+        total_cleared += cleared
+        if cleared + combined == 0:
+            return total_cleared, total_combined
+        # delete the tiles that are not connected to the bottom row (as
+        # Board.delete_floating)
+        masks = [sum(1 << x for x, exponent in enumerate(row) if exponent)
+                 if any(row) else 0 for row in rows]
+        connected = connected_rows(masks)
+        for row, mask, bits in zip(rows, masks, connected):
+            if mask != bits:
+                for x in range(w):
+                    if (mask & ~bits) >> x & 1:
+                        total_combined += 1 << row[x]
+                        row[x] = 0
+        # only the clears make new pairs (in any column), the merged columns
+        # have no pairs left and the deletions leave gaps
+        columns = range(w) if cleared else ()
+
+
+# Function that returns the given number of the tile number patterns (the
+# exponents of the 4 tiles) of a piece. All the 16 patterns are returned when
+# the number is 16 or more, since PieceGenerator draws each tile as a 2 or a 4
+# with equal chances. Fewer patterns are a sample drawn by the given random
+# generator in pairs of a pattern and its complement (each tile is a 2 in one
+# of them), so that each tile of the sampled patterns is a 2 in half of them as
+# in the generated pieces (when the number is even).
+def tile_patterns(number, rng):
+    patterns = list(itertools.product((1, 2), repeat=4))
+    if number >= len(patterns):
+        return patterns
+    pairs = [(pattern, tuple(3 - exponent for exponent in pattern))
+             for pattern in patterns if pattern[0] == 1]
+    rng.shuffle(pairs)
+    return [pattern for pair in pairs for pattern in pair][:number]
+
+
+# Class used for storing the values of the searched boards. When it is full,
+# the least recently used value is removed for each new one.
+class TranspositionTable:
+    # Constructor that creates an empty table for the given number of values
+    def __init__(self, size=1 << 16):
+        self.size = size
+        self.values = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # Method that returns the value stored for the given key (None if none)
+    def get(self, key):
+        value = self.values.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.values.move_to_end(key)
+        return value
+
+    # Method for storing a value for the given key
+    def put(self, key, value):
+        self.values[key] = value
+        self.values.move_to_end(key)
+        if len(self.values) > self.size:
+            self.values.popitem(last=False)
+
+
+# Exception raised in the search when the time budget of the move is over
+class SearchTimeout(Exception):
+    pass
+
+
+# Class used for choosing the placements of the pieces with an expectimax search
+# that is deepened while the time budget of each move lasts
+class AutoPlayer:
+    # Constructor that creates a player with the given time budget in seconds
+    # for each move (None for searching max_depth pieces ahead on every move),
+    # the largest number of the pieces searched ahead, the number of the best
+    # placements of each piece that are searched deeper, the number of the
+    # tile number patterns of each type for the unknown pieces (a sample of the
+    # patterns, or all of them for 16, see tile_patterns), the number of
+    # the values in the transposition table, the weights of the features and
+    # the seed of the tile number patterns
+    def __init__(self, time_budget=0.5, max_depth=4, beam_width=4, patterns=2,
+                 table_size=1 << 16, weights=WEIGHTS, seed=2048):
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.beam_width = beam_width
+        self.weights = weights
+        self.table = TranspositionTable(table_size)
+        # the possible pieces after the known ones as (type, exponents), which
+        # are all equally likely
+        rng = random.Random(seed)
+        self.chances = [(type, pattern) for type in TYPES
+                        for pattern in tile_patterns(patterns, rng)]
+        self.deadline = None
+        # the number of the pieces searched ahead for the last move
+        self.depth = 0
+
+    # Method that returns the placements of a piece with the given type and
+    # exponents, from its given state (rotation, x, y) on the board, as a list
+    # of (value, gained score, rows of the value matrix after the placement,
+    # placement) tuples from the best to the worst by the gained score and the
+    # value of the board. The placements are done on the rows of the value
+    # matrix as lists (no board is made for them until they are searched
+    # deeper, see child_board), and the placements after which nothing merges
+    # or is cleared are valued from the features of the board without the rows
+    # (which are None then).
+    def expand(self, board, type, exponents, state):
+        rows = board.value_matrix.tolist()
+        features = row_features(rows)
+        row_counts = [board.grid_width - row.count(0) for row in rows]
+        orientations = ROTATION_TABLES[type]
+        children = []
+        for placement in find_placements(board, type, *state):
+            rotation, x, y = placement
+            cells = {(x + dx, y + dy): exponent for (dx, dy), exponent
+                     in zip(orientations[rotation].offsets, exponents)}
+            placed = placed_features(rows, features, row_counts, cells)
+            if placed == LOSS:
+                children.append((LOSS, 0, None, placement))
+            elif placed is not None:
+                children.append((feature_value(*placed, self.weights), 0, None, placement))
+            else:
+                child_rows = [list(row) for row in rows]
+                for (x, y), exponent in cells.items():
+                    child_rows[y][x] = exponent
+                cleared, combined = resolve_rows(child_rows, {x for x, y in cells})
+                gained = cleared * 100 + combined
+                children.append((gained + feature_value(*row_features(child_rows),
+                                                        self.weights),
+                                 gained, child_rows, placement))
+        children.sort(key=lambda child: child[0], reverse=True)
+        return children
+
+    # Method that returns the board after the placement of the given child (see
+    # expand) of a piece with the given type and exponents on the board
+    def child_board(self, board, type, exponents, child):
+        # (nothing merges or is cleared after the placement)
+        if child[2] is None:
+            return place(board, type, exponents, child[3])
+        child_board = board.copy()
+        child_board.value_matrix = np.array(child[2], dtype=np.uint8)
+        child_board.update_heights()
+        child_board.update_hash()
+        child_board.update_bitboard()
+        return child_board
+
+    # Method that returns the value of placing the given piece (type, exponents,
+    # state) and then the given known pieces (type, exponents) and the unknown
+    # ones on the board, for depth pieces in all
+    def max_value(self, board, piece, known, depth):
+        children = self.expand(board, *piece)
+        if not children:
+            return LOSS
+        if depth == 1:
+            return children[0][0]
+        best = LOSS
+        for child in children[:self.beam_width]:
+            value = child[0]
+            if value != LOSS:
+                value = child[1] + self.value(
+                    self.child_board(board, piece[0], piece[1], child), known, depth - 1)
+            best = max(best, value)
+        return best
+
+    # Method that returns the value of the board for the given known pieces
+    # (type, exponents) and the unknown ones after them, for depth pieces in all
+    # (the average over the possible pieces for the unknown ones)
+    def value(self, board, known, depth):
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+        key = (board.hash, known, depth)
+        value = self.table.get(key)
+        if value is not None:
+            return value
+        # the pieces enter above the stack, where their placements do not
+        # depend on the horizontal position
+        spawn = (0, 0, board.grid_height)
+        if known:
+            value = self.max_value(board, known[0] + (spawn,), known[1:], depth)
+        else:
+            value = sum(self.max_value(board, chance + (spawn,), (), depth)
+                        for chance in self.chances) / len(self.chances)
+        self.table.put(key, value)
+        return value
+
+    # Method that returns the best placement (rotation, x, y) of the given
+    # current piece (type, exponents, state) on the board when the given piece
+    # (type, exponents) comes next, or None if the piece cannot be placed. The
+    # time budget includes the placements of the current piece.
+    def choose(self, board, current, next_piece):
+        self.deadline = None
+        if self.time_budget is not None:
+            self.deadline = time.perf_counter() + self.time_budget
+        # the moves of the pieces are checked with the bitboard
+        if board.row_bits is None:
+            board = board.copy()
+            board.row_bits = []
+            board.update_bitboard()
+        children = self.expand(board, *current)
+        if not children:
+            return None
+        best_placement = children[0][3]
+        self.depth = 1
+        # deepen the search one piece at a time (the best placement of the last
+        # completed depth is used when the time is over)
+        for depth in range(2, self.max_depth + 1):
+            # (after the known next piece, only the best placements of the last
+            # depth are searched deeper)
+            if depth > 2:
+                children = children[:self.beam_width]
+            try:
+                values = []
+                for child in children:
+                    value = child[0]
+                    if value != LOSS:
+                        value = child[1] + self.value(
+                            self.child_board(board, current[0], current[1], child),
+                            (next_piece,), depth - 1)
+                    values.append(value)
+            except SearchTimeout:
+                break
+            children = sorted(((value,) + child[1:] for value, child in zip(values, children)),
+                              key=lambda child: child[0], reverse=True)
+            best_placement, self.depth = children[0][3], depth
+        self.deadline = None
+        return best_placement
+
+    # Method that returns the actions of the game that take the current piece of
+    # the engine to the best placement and lock it there (it can be used as the
+    # policy of Engine.play)
+    def policy(self, engine):
+        piece, next_piece = engine.current_piece, engine.next_piece
+        placement = self.choose(
+            engine.board, (piece.type, tuple(piece.exponents), (piece.rotation, piece.x, piece.y)),
+            (next_piece.type, tuple(next_piece.exponents)))
+        if placement is None:
+            return ["space"]
+        return find_path(engine.board, piece, placement)
+
+
+# the autoplayer of a planning process (see init_planner)
+PLANNER = None
+
+
+# Function for creating the autoplayer of a planning process (e.g. the
+# initializer of a process pool) with the given arguments of AutoPlayer, so
+# that the search does not compete with the game loop for the interpreter
+def init_planner(*args, **kwargs):
+    global PLANNER
+    PLANNER = AutoPlayer(*args, **kwargs)
+
+
+# Function that returns the placement chosen by the autoplayer of the planning
+# process (see AutoPlayer.choose and grid_state)
+def choose_placement(board, current, next_piece):
+    return PLANNER.choose(board, current, next_piece)
+
+
+# Function that returns the arguments of AutoPlayer.choose for the current
+# tetromino of the game grid when grid.next_tetromino comes next: a copy of the
+# grid as a board, and the current and the next pieces
+def grid_state(grid):
+    pieces = [tetromino_piece(grid, tetromino)
+              for tetromino in (grid.current_tetromino, grid.next_tetromino)]
+    piece, next_piece = pieces
+    return (grid.copy(),
+            (piece.type, tuple(piece.exponents), (piece.rotation, piece.x, piece.y)),
+            (next_piece.type, tuple(next_piece.exponents)))
+
+
+# Function that returns the keys that take the current tetromino of the game
+# grid (where it is now) to the given placement (chosen by AutoPlayer.choose,
+# None if there is none) and lock it there
+def grid_keys(grid, placement):
+    if placement is None:
+        return ["space"]
+    return find_path(grid, tetromino_piece(grid, grid.current_tetromino), placement)
+
+
+# Function that returns a piece for the given tetromino on the game grid
+def tetromino_piece(grid, tetromino):
+    piece = Piece(tetromino.type, grid.grid_height, grid.grid_width,
+                  tetromino.bottom_left_corner.x)
+    piece.rotation, piece.y = tetromino.rotation, tetromino.bottom_left_corner.y
+    piece.exponents = [tile.number.bit_length() - 1 for tile in tetromino.tiles]
+    return piece
+
+
+# Function that returns a copy of the board after the piece with the given type
+# and exponents is placed on it at the given placement (rotation, x, y)
+def place(board, type, exponents, placement):
+    rotation, x, y = placement
+    piece = Piece(type, board.grid_height, board.grid_width, x)
+    piece.rotation, piece.y = rotation, y
+    piece.exponents = list(exponents)
+    child = board.copy()
+    child.update_grid(piece)
+    return child
+
+
+# Function that returns the cells of a piece with the given type and state
+def cells_of(type, rotation, x, y):
+    return frozenset((x + dx, y + dy) for dx, dy in ROTATION_TABLES[type][rotation].offsets)
+
+
+# Function that returns the keys of the game ('up', 'left', 'right', 'down' and
+# 'space') that take the piece to the given placement (rotation, x, y) on the
+# board and lock it there. The piece is rotated, moved sideways and dropped if
+# this is enough, and otherwise the shortest way is searched.
+def find_path(board, piece, placement):
+    target = cells_of(piece.type, *placement)
+    moved, actions = piece.copy(), []
+    for i in range((placement[0] - piece.rotation) % 4):
+        moved.rotate(board)
+        actions.append("up")
+    direction = "left" if placement[1] < moved.x else "right"
+    while moved.x != placement[1] and moved.move(direction, board):
+        actions.append(direction)
+    moved.hard_drop(board)
+    if cells_of(moved.type, moved.rotation, moved.x, moved.y) == target:
+        return actions + ["space"]
+    # breadth-first search of the states of the piece
+    start = (piece.rotation, piece.x, piece.y)
+    parents = {start: None}
+    queue = [start]
+    for state in queue:
+        if cells_of(piece.type, *state) == target:
+            actions = []
+            while parents[state] is not None:
+                state, action = parents[state]
+                actions.append(action)
+            return actions[::-1] + ["space"]
+        for action in ("left", "right", "down", "up"):
+            moved = piece.copy()
+            moved.rotation, moved.x, moved.y = state
+            if action == "up":
+                if not moved.rotate(board):
+                    continue
+            elif not moved.move(action, board):
+                continue
+            next_state = (moved.rotation, moved.x, moved.y)
+            if next_state not in parents:
+                parents[next_state] = (state, action)
+                queue.append(next_state)
+    # (the placement is not reachable) the piece is dropped where it is
+    return ["space"]
+
+
+#-----------------------------------------------------------------------
+
+def _check_paths(games=3, seed=24):
+    """
+    Play games with the random policy and check for the current piece
+    that the keys found for each of its placements lock it there.
+    """
+    from engine import Engine, random_policy
+    random.seed(seed)
+    engine = Engine(seed=seed)
+    checks = 0
+    for _ in range(games):
+        engine.reset()
+        while not engine.game_over:
+            piece = engine.current_piece
+            for placement in piece.get_placements(engine.board):
+                moved = piece.copy()
+                for action in find_path(engine.board, piece, placement):
+                    if action == "up":
+                        moved.rotate(engine.board)
+                    elif action == "space":
+                        moved.hard_drop(engine.board)
+                    else:
+                        moved.move(action, engine.board)
+                assert cells_of(moved.type, moved.rotation, moved.x, moved.y) == \
+                    cells_of(piece.type, *placement)
+                checks += 1
+            for action in random_policy(engine):
+                engine.step(action)
+    print('paths: %d placements are reached by their keys' % checks)
+
+
+def _check_expand(games=2, max_pieces=50, seed=24):
+    """
+    Play games with the autoplayer and check for the boards of their
+    first pieces that the placements of every possible piece are valued and resolved
+    by expand as by placing them on a copy of the board, resolving it and
+    evaluating it.
+    """
+    from engine import Engine
+    player = AutoPlayer(time_budget=None, max_depth=1)
+    checks = 0
+    for game in range(games):
+        engine = Engine(seed=seed + game)
+        while not engine.game_over and engine.pieces_placed < max_pieces:
+            board = engine.board
+            spawn = (0, 0, board.grid_height)
+            for type, exponents in player.chances:
+                for child in player.expand(board, type, exponents, spawn):
+                    expected = place(board, type, exponents, child[3])
+                    if expected.game_over:
+                        assert child[0] == LOSS
+                        continue
+                    cleared, combined = expected.resolve()
+                    gained = cleared * 100 + combined
+                    assert child[:2] == (gained + evaluate(expected), gained)
+                    actual = player.child_board(board, type, exponents, child)
+                    assert (actual.value_matrix == expected.value_matrix).all()
+                    assert (actual.column_heights == expected.column_heights).all()
+                    assert actual.hash == expected.hash
+                    checks += 1
+            for action in player.policy(engine):
+                engine.step(action)
+    print('expand: %d placements are valued as on the boards' % checks)
+
+
+def _benchmark_games(games=3, max_pieces=150, seed=24, time_budgets=(0.02, 0.5)):
+    """
+    Play the same games with the autoplayer for a few time budgets and
+    print the scores, the depths searched and the hits of the
+    transposition table. The smallest budget allows about one piece of
+    search, and the largest one about three on a typical machine. The
+    games are long enough for the deeper search to pay off (see
+    _benchmark_depths).
+    """
+    from engine import Engine
+    for time_budget in time_budgets:
+        player = AutoPlayer(time_budget)
+        scores, depths, moves = [], [], 0
+        start_time = time.perf_counter()
+        for game in range(games):
+            engine = Engine(seed=seed + game)
+            while not engine.game_over and engine.pieces_placed < max_pieces:
+                placed = engine.pieces_placed
+                for action in player.policy(engine):
+                    engine.step(action)
+                if engine.pieces_placed == placed and not engine.game_over:
+                    engine.step("space")
+                depths.append(player.depth)
+                moves += 1
+            scores.append(engine.score)
+        elapsed = time.perf_counter() - start_time
+        table = player.table
+        print('time budget %.2f s: mean score %.1f (%s), mean depth %.2f, '
+              '%.3f s per move, table hits %.0f%%'
+              % (time_budget, sum(scores) / games, ', '.join(map(str, scores)),
+                 sum(depths) / len(depths),
+                 elapsed / moves, 100 * table.hits / max(1, table.hits + table.misses)))
+
+
+def _benchmark_depths(games=3, max_pieces=150, seed=24, depths=(1, 2, 3)):
+    """
+    Play the same games with the autoplayer searching a fixed number of
+    pieces ahead (without a time budget) and print the mean scores, to
+    show that searching deeper pays off.
+    """
+    from engine import Engine
+    for depth in depths:
+        player = AutoPlayer(time_budget=None, max_depth=depth)
+        scores, moves = [], 0
+        start_time = time.perf_counter()
+        for game in range(games):
+            engine = Engine(seed=seed + game)
+            scores.append(engine.play(player.policy, max_pieces))
+            moves += engine.pieces_placed
+        elapsed = time.perf_counter() - start_time
+        print('depth %d: mean score %.1f (%s), %.3f s per move'
+              % (depth, sum(scores) / games, ', '.join(map(str, scores)),
+                 elapsed / moves))
+
+
+def _main():
+    """
+    Check the paths of the placements and measure how well the autoplayer
+    plays with various time budgets.
+    """
+    _check_paths()
+    _check_expand()
+    _benchmark_games()
+    _benchmark_depths()
+
+
+if __name__ == '__main__':
+    _main()
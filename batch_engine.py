@@ -0,0 +1,492 @@
+import numpy as np  # fundamental Python module for scientific computing
+import time  # used for measuring the simulation speed
+from engine import TYPES, ACTIONS, ROTATION_TABLES, PieceGenerator, Engine
+
+# The batch_engine module simulates many games at once: the boards of N games
+# are kept in one (N, grid_h, grid_w) array of the log2 of the tile numbers and
+# the pieces in arrays of N elements, and each operation of the engine module
+# (moving, rotating and dropping the pieces, locking them, clearing the full
+# rows, merging the tiles and deleting the floating tiles) is applied to all the
+# games with NumPy operations. Each game gives the same results as an Engine
+# with the same seed given the same actions.
+
+# (dx, dy) of the 4 tiles of each orientation (indexed by 4 * type index +
+# rotation) w.r.t. the bottom left cell of its tile matrix
+OFFSETS = np.array([ROTATION_TABLES[type][rotation].offsets
+                    for type in TYPES for rotation in range(4)], dtype=np.int64)
+# wall kicks of each type (by its index), padded with the first kick (which is
+# tried again in vain) to the same length
+KICKS = np.array([kicks + kicks[:1] * (5 - len(kicks)) for kicks in
+                  (ROTATION_TABLES[type][0].kicks for type in TYPES)], dtype=np.int64)
+
+
+# Class used for simulating N games at once. The state of game i is given by
+# boards[i], the current piece (current_types[i], rotations[i], xs[i], ys[i],
+# exponents[i]), the next piece and the counters (score[i], cleared[i],
+# combined[i], pieces_placed[i] and game_over[i]).
+class BatchEngine:
+    # Constructor for creating n new games with the given board dimensions and
+    # the pieces generated with the given seeds (n random seeds if None)
+    def __init__(self, n, grid_h=20, grid_w=12, seeds=None):
+        # (the rows of the boards are handled as 16 bit masks)
+        if grid_w > 16:
+            raise ValueError('the grid width of a BatchEngine is at most 16')
+        self.n = n
+        self.grid_height = grid_h
+        self.grid_width = grid_w
+        # the masks of grid_w bits with the bits in reverse order
+        bits = np.arange(2 ** grid_w)
+        self.reversed_bits = np.zeros(2 ** 16, dtype=np.uint16)
+        for x in range(grid_w):
+            self.reversed_bits[:2 ** grid_w] |= \
+                ((bits >> x) & 1).astype(np.uint16) << (grid_w - 1 - x)
+        if seeds is None:
+            seeds = [None] * n
+        self.generators = [PieceGenerator(seed, grid_w) for seed in seeds]
+        self.seeds = [generator.seed for generator in self.generators]
+        # the pieces generated for each game and the index of the next one
+        size = PieceGenerator.block_size
+        self.queue_types = np.zeros((n, size), dtype=np.int64)
+        self.queue_xs = np.zeros((n, size), dtype=np.int64)
+        self.queue_exponents = np.zeros((n, size, 4), dtype=np.uint8)
+        self.queue_index = np.full(n, size)
+        # the boards and the counters of the games
+        self.boards = np.zeros((n, grid_h, grid_w), dtype=np.uint8)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.cleared = np.zeros(n, dtype=np.int64)
+        self.combined = np.zeros(n, dtype=np.int64)
+        self.pieces_placed = np.zeros(n, dtype=np.int64)
+        self.game_over = np.zeros(n, dtype=bool)
+        # the current pieces: the orientation index, the position of the bottom
+        # left cell of the tile matrix and the exponents of the 4 tiles
+        self.orientations = np.zeros(n, dtype=np.int64)
+        self.xs = np.zeros(n, dtype=np.int64)
+        self.ys = np.zeros(n, dtype=np.int64)
+        self.exponents = np.zeros((n, 4), dtype=np.uint8)
+        # the next pieces (which enter the board with rotation 0)
+        self.next_types = np.zeros(n, dtype=np.int64)
+        self.next_xs = np.zeros(n, dtype=np.int64)
+        self.next_exponents = np.zeros((n, 4), dtype=np.uint8)
+        self.reset()
+
+    # Method for restarting all the games with empty boards and zero scores
+    def reset(self):
+        self.restart(np.arange(self.n))
+
+    # Method for restarting the given games (e.g. the ones that are over) with
+    # empty boards and zero scores, as Engine.reset does
+    def restart(self, games):
+        self.boards[games] = 0
+        self.score[games] = 0
+        self.cleared[games] = 0
+        self.combined[games] = 0
+        self.pieces_placed[games] = 0
+        self.game_over[games] = False
+        self.create_pieces(games)
+        self.spawn(games)
+
+    # Properties for the types (by their index in TYPES) and the rotations of
+    # the current pieces
+    @property
+    def current_types(self):
+        return self.orientations // 4
+
+    @property
+    def rotations(self):
+        return self.orientations % 4
+
+    # Method for taking the next pieces of the given games from their generators
+    def create_pieces(self, games):
+        size = PieceGenerator.block_size
+        for i in games[self.queue_index[games] == size].tolist():
+            types, xs, exponents = self.generators[i].batch(size)
+            self.queue_types[i] = types
+            self.queue_xs[i] = xs
+            self.queue_exponents[i] = exponents
+            self.queue_index[i] = 0
+        index = self.queue_index[games]
+        self.next_types[games] = self.queue_types[games, index]
+        self.next_xs[games] = self.queue_xs[games, index]
+        self.next_exponents[games] = self.queue_exponents[games, index]
+        self.queue_index[games] += 1
+
+    # Method that returns which pieces of the given games fit on their boards
+    # with the given orientations and bottom left cells (x, y). Rows above the
+    # boards are not checked for collisions.
+    def fits(self, games, orientations, xs, ys):
+        h, w = self.grid_height, self.grid_width
+        cell_xs = xs[:, None] + OFFSETS[orientations, :, 0]
+        cell_ys = ys[:, None] + OFFSETS[orientations, :, 1]
+        inside = (cell_xs >= 0) & (cell_xs < w) & (cell_ys >= 0)
+        on_board = inside & (cell_ys < h)
+        cells = (games[:, None] * h + np.where(on_board, cell_ys, 0)) * w + \
+            np.where(on_board, cell_xs, 0)
+        occupied = (self.boards.reshape(-1)[cells] != 0) & on_board
+        return inside.all(axis=1) & ~occupied.any(axis=1)
+
+    # Method for moving the current pieces of the given games by (dx, dy) if
+    # they fit there. Returns which of the pieces have moved.
+    def move(self, games, dx, dy):
+        moved = self.fits(games, self.orientations[games], self.xs[games] + dx,
+                          self.ys[games] + dy)
+        games = games[moved]
+        self.xs[games] += dx
+        self.ys[games] += dy
+        return moved
+
+    # Method for rotating the current pieces of the given games clockwise by
+    # using the first wall kick that fits on the boards (as find_rotation does)
+    def rotate(self, games):
+        orientations = self.orientations[games]
+        rotated = orientations - orientations % 4 + (orientations + 1) % 4
+        kicks = KICKS[orientations // 4]
+        fit = np.stack([self.fits(games, rotated, self.xs[games] + kicks[:, k],
+                                  self.ys[games])
+                        for k in range(kicks.shape[1])], axis=1)
+        can_rotate = fit.any(axis=1)
+        kick = kicks[np.arange(len(games)), fit.argmax(axis=1)]
+        games = games[can_rotate]
+        self.orientations[games] = rotated[can_rotate]
+        self.xs[games] += kick[can_rotate]
+
+    # Method for dropping the current pieces of the given games at once to
+    # where they land on the boards
+    def hard_drop(self, games):
+        h = self.grid_height
+        cell_xs = self.xs[games, None] + OFFSETS[self.orientations[games], :, 0]
+        cell_ys = self.ys[games, None] + OFFSETS[self.orientations[games], :, 1]
+        # the column of each tile as an (n, 4, grid_h) array, and the row of
+        # the topmost tile below each tile (-1 if there is none)
+        columns = self.boards[games[:, None], :, cell_xs]
+        rows = np.arange(h)
+        is_below = (columns != 0) & (rows < cell_ys[:, :, None])
+        top = np.where(is_below, rows, -1).max(axis=2)
+        self.ys[games] -= (cell_ys - 1 - top).min(axis=1)
+
+    # Method for applying the given action (by its index in ACTIONS, or -1 for
+    # no action) of each game to its current piece as Engine.step does.
+    # Returns which games are not over.
+    def step(self, actions):
+        actions = np.asarray(actions)
+        playing = ~self.game_over
+        for index, (dx, dy) in ((0, (-1, 0)), (1, (1, 0)), (2, (0, -1))):
+            games = np.flatnonzero(playing & (actions == index))
+            if len(games):
+                self.move(games, dx, dy)
+        games = np.flatnonzero(playing & (actions == ACTIONS.index("up")))
+        if len(games):
+            self.rotate(games)
+        games = np.flatnonzero(playing & (actions == ACTIONS.index("space")))
+        if len(games):
+            self.hard_drop(games)
+            self.lock(games)
+        return ~self.game_over
+
+    # Method for moving the current pieces of all the games down by 1 as
+    # Engine.tick does, and locking the ones that cannot go down anymore.
+    # Returns which games are not over.
+    def tick(self):
+        games = np.flatnonzero(~self.game_over)
+        moved = self.move(games, 0, -1)
+        self.lock(games[~moved])
+        return ~self.game_over
+
+    # Method for making the next pieces of the given games the current ones.
+    # As in the game, each piece is moved once after spawning. Returns which of
+    # the pieces could not move (they are to be locked at once).
+    def spawn(self, games):
+        self.orientations[games] = self.next_types[games] * 4
+        self.xs[games] = self.next_xs[games]
+        self.ys[games] = self.grid_height
+        self.exponents[games] = self.next_exponents[games]
+        self.create_pieces(games)
+        return ~self.move(games, 0, -1)
+
+    # Method for placing the current pieces of the given games on their boards,
+    # merging and clearing the tiles until nothing changes, updating the scores
+    # and spawning the next pieces (and locking the ones that cannot move)
+    def lock(self, games):
+        h, w = self.grid_height, self.grid_width
+        while len(games):
+            cell_xs = self.xs[games, None] + OFFSETS[self.orientations[games], :, 0]
+            cell_ys = self.ys[games, None] + OFFSETS[self.orientations[games], :, 1]
+            # the game is over if any placed tile is out of the board
+            on_board = cell_ys < h
+            cells = (games[:, None] * h + cell_ys) * w + cell_xs
+            self.boards.reshape(-1)[cells[on_board]] = self.exponents[games][on_board]
+            self.pieces_placed[games] += 1
+            over = ~on_board.all(axis=1)
+            self.resolve(games, over)
+            self.score[games] = self.cleared[games] * 100 + self.combined[games]
+            self.game_over[games[over]] = True
+            games = games[~over]
+            games = games[self.spawn(games)]
+
+    # Method for merging, clearing and deleting the floating tiles of the given
+    # games until nothing changes (as Engine.lock does). A locked piece rests on
+    # the connected tiles or on the bottom row, so only the boards on which
+    # tiles are merged or cleared, and the given boards (on which a piece is
+    # locked partly above the board), can have floating tiles.
+    def resolve(self, games, may_float=None):
+        if may_float is None:
+            may_float = np.zeros(len(games), dtype=bool)
+        while len(games):
+            merged = self.clear_2048(games)
+            self.combined[games] += merged
+            cleared = self.clear(games)
+            self.cleared[games] += cleared
+            changed = (merged > 0) | (cleared > 0)
+            floating = games[changed | may_float]
+            self.combined[floating] += self.delete_floating(floating)
+            games = games[changed]
+            may_float = np.zeros(len(games), dtype=bool)
+
+    # Method for clearing the full rows of the given games and moving the upper
+    # rows down. Returns the number of the cleared rows of each game.
+    def clear(self, games):
+        h = self.grid_height
+        is_full = self.boards[games].all(axis=2)
+        number_of_pushes = np.count_nonzero(is_full, axis=1)
+        with_full = number_of_pushes > 0
+        if not with_full.any():
+            return number_of_pushes
+        games, is_full = games[with_full], is_full[with_full]
+        # keep the remaining rows in order at the bottom and empty the rest
+        order = np.argsort(is_full, axis=1, kind='stable')
+        boards = np.take_along_axis(self.boards[games], order[:, :, None], axis=1)
+        boards[np.arange(h)[None, :] >= h - number_of_pushes[with_full, None]] = 0
+        self.boards[games] = boards
+        return number_of_pushes
+
+    # Method for merging the vertically adjacent tiles with the same number as
+    # Board.clear_2048 does (the lowest pair of every column of every game at
+    # once until no pair is left). Returns the sum of the numbers on the merged
+    # tiles of each game.
+    def clear_2048(self, games):
+        h = self.grid_height
+        counter = np.zeros(len(games), dtype=np.int64)
+        boards = self.boards[games]
+        is_pair = (boards[:, :-1] != 0) & (boards[:, :-1] == boards[:, 1:])
+        # the (game, column) pairs that have pairs of tiles to merge, and these
+        # columns as rows of an array
+        with_pairs, xs = np.nonzero(is_pair.any(axis=1))
+        if len(xs) == 0:
+            return counter
+        columns = boards[with_pairs, :, xs]
+        rows = np.arange(h)[None, :]
+        # only the columns that have changed can have new pairs
+        candidates = np.arange(len(columns))
+        while len(candidates):
+            c = columns[candidates]
+            is_pair = (c[:, :-1] != 0) & (c[:, :-1] == c[:, 1:])
+            has_pair = is_pair.any(axis=1)
+            if not has_pair.any():
+                break
+            candidates, c, is_pair = candidates[has_pair], c[has_pair], is_pair[has_pair]
+            # row of the lowest pair in each of these columns
+            ys = is_pair.argmax(axis=1)[:, None]
+            # the tiles above each pair (except the topmost one) go down by 1,
+            # the cell freed by this shift (or by the merge) becomes empty
+            above = rows > ys
+            source = np.where(above & (rows < h - 2), rows + 1, rows)
+            c = np.take_along_axis(c, source, axis=1)
+            c[above & (rows == h - 2)] = 0
+            c[(rows == h - 1) & (ys == h - 2)] = 0
+            index = np.arange(len(c))
+            c[index, ys[:, 0]] += 1
+            columns[candidates] = c
+            np.add.at(counter, with_pairs[candidates],
+                      np.left_shift(1, c[index, ys[:, 0]].astype(np.int64)))
+        self.boards[games[with_pairs], :, xs] = columns
+        return counter
+
+    # Method for deleting the tiles of the given games that are not connected
+    # to the bottom row through their 4-connected neighbors. The flood fill is
+    # done on the rows as bit masks: each step spreads the connected tiles to
+    # the rows above and below, and then to the whole runs of tiles in each
+    # row. Returns the sum of the numbers on the deleted tiles of each game.
+    def delete_floating(self, games):
+        w = self.grid_width
+        boards = self.boards[games]
+        occupied = boards != 0
+        # (the rows above the highest tile of the boards are left out)
+        height = occupied.any(axis=(0, 2)).nonzero()[0]
+        height = height[-1] + 1 if len(height) else 1
+        boards, occupied = boards[:, :height], occupied[:, :height]
+        # bit x of row_bits[i, y] is set if the cell (y, x) of game i is occupied
+        packed = np.packbits(occupied, axis=2, bitorder='little')
+        row_bits = np.zeros(occupied.shape[:2] + (2,), dtype=np.uint8)
+        row_bits[:, :, :packed.shape[2]] = packed
+        row_bits = row_bits.view('<u2')[:, :, 0]
+        reversed_row_bits = self.reversed_bits[row_bits]
+        connected = fill_runs(row_bits[:, :1], row_bits[:, :1],
+                              reversed_row_bits[:, :1], self.reversed_bits)
+        connected = np.concatenate(
+            [connected, np.zeros_like(row_bits[:, 1:])], axis=1)
+        # the boards on which the connected tiles have spread in the last step
+        spreading = np.arange(len(games))
+        while len(spreading):
+            last = connected[spreading]
+            seeds = last.copy()
+            seeds[:, 1:] |= last[:, :-1]
+            seeds[:, :-1] |= last[:, 1:]
+            runs = row_bits[spreading]
+            seeds &= runs
+            spread = fill_runs(runs, seeds, reversed_row_bits[spreading],
+                               self.reversed_bits)
+            connected[spreading] = spread
+            spreading = spreading[(spread != last).any(axis=1)]
+        floating_bits = row_bits & ~connected
+        counter = np.zeros(len(games), dtype=np.int64)
+        with_floating = floating_bits.any(axis=1)
+        if not with_floating.any():
+            return counter
+        games, boards = games[with_floating], boards[with_floating]
+        floating = ((floating_bits[with_floating, :, None] >>
+                     np.arange(w, dtype=np.uint16)) & 1).astype(bool)
+        counter[with_floating] = np.where(
+            floating, np.left_shift(1, boards.astype(np.int64)), 0).sum(axis=(1, 2))
+        boards[floating] = 0
+        self.boards[games, :height] = boards
+        return counter
+
+
+# Function that returns the bits of the given runs of 1 bits (the rows of the
+# boards as bit masks) that are in the same run as one of the given seed bits.
+# Adding the seeds to the runs carries from each seed to the end of its run, so
+# a run is filled upwards from its lowest seed by (runs & ~(runs + seeds)) and
+# it is filled downwards in the same way with the bits in reverse order.
+def fill_runs(runs, seeds, reversed_runs, reversed_bits):
+    upwards = (runs & ~(runs + seeds)) | seeds
+    reversed_seeds = reversed_bits[seeds]
+    downwards = (reversed_runs & ~(reversed_runs + reversed_seeds)) | reversed_seeds
+    return upwards | reversed_bits[downwards]
+
+
+# Function that returns the actions of the random policy of the engine module
+# for n games as an (n, steps) array of action indexes (-1 for no action): a
+# random number of rotations, moves in a random direction and a hard drop. The
+# hard drops are all in the last step, so that the pieces of all the games are
+# locked at once.
+def random_actions(rng, n, grid_width=12):
+    rotations = rng.integers(0, 4, n)[:, None]
+    directions = rng.integers(0, 2, n)[:, None]
+    moves = rng.integers(0, grid_width // 2 + 1, n)[:, None]
+    steps = np.arange(3 + grid_width // 2 + 1)[None, :]
+    actions = np.full((n, steps.shape[1]), -1)
+    actions = np.where(steps < rotations, ACTIONS.index("up"), actions)
+    actions = np.where((steps >= rotations) & (steps < rotations + moves),
+                       directions, actions)
+    actions[:, -1] = ACTIONS.index("space")
+    return actions
+
+
+#-----------------------------------------------------------------------
+
+def _check_against_engine(games=200, rounds=400):
+    """
+    Play games with random actions on a BatchEngine and on an Engine for
+    each game (with the same seeds and actions), and check after each
+    round that the boards, the pieces and the counters are the same.
+    """
+    rng = np.random.default_rng(2048)
+    seeds = rng.integers(0, 2 ** 32, games).tolist()
+    batch = BatchEngine(games, seeds=seeds)
+    engines = [Engine(seed=seed) for seed in seeds]
+    checks = 0
+    for round in range(rounds):
+        # random moves and rotations are mixed in (also after the hard drops,
+        # so that the next pieces are moved, or locked by gravity at spawn)
+        actions = random_actions(rng, games)
+        mixed_in = rng.random(actions.shape) < 0.1
+        actions[mixed_in] = rng.integers(0, 4, actions.shape)[mixed_in]
+        for column in actions.T:
+            batch.step(column)
+            for engine, action in zip(engines, column.tolist()):
+                if action >= 0:
+                    engine.step(ACTIONS[action])
+        if round % 3 == 0:
+            batch.tick()
+            for engine in engines:
+                engine.tick()
+        for i, engine in enumerate(engines):
+            piece = engine.current_piece
+            assert (batch.boards[i] == engine.board.value_matrix).all(), (round, i)
+            assert (batch.score[i], batch.cleared[i], batch.combined[i],
+                    batch.pieces_placed[i], batch.game_over[i]) == \
+                (engine.score, engine.cleared, engine.combined,
+                 engine.pieces_placed, engine.game_over), (round, i)
+            if not engine.game_over:
+                assert (TYPES[batch.current_types[i]], batch.rotations[i],
+                        batch.xs[i], batch.ys[i], batch.exponents[i].tolist()) == \
+                    (piece.type, piece.rotation, piece.x, piece.y,
+                     piece.exponents), (round, i)
+            checks += 1
+        if batch.game_over.all():
+            break
+    print('batch engine: %d checks of %d games match the engine (%d locks)' %
+          (checks, games, batch.pieces_placed.sum()))
+
+
+def _check_board_operations(boards=2000):
+    """
+    Check on random boards (and on the pathological boards of the engine
+    module) that clear_2048, clear and delete_floating of the batch
+    engine give the same boards and results as the ones of Board.
+    """
+    from engine import Board, _pathological_boards
+    rng = np.random.default_rng(2048)
+    batch = BatchEngine(boards, seeds=range(boards))
+    density = rng.random((boards, 1, 1))
+    batch.boards[:] = np.where(rng.random(batch.boards.shape) < density,
+                               rng.integers(1, 4, batch.boards.shape), 0)
+    # some boards with full rows
+    batch.boards[::7, :5] = rng.integers(1, 3, (len(batch.boards[::7]), 5, 12))
+    pathological = list(_pathological_boards().values())
+    for i, board in enumerate(pathological):
+        batch.boards[i] = board.value_matrix
+    games = np.arange(boards)
+    for operation in ('clear_2048', 'clear', 'delete_floating'):
+        references = []
+        for matrix in batch.boards:
+            board = Board(batch.grid_height, batch.grid_width)
+            board.value_matrix = matrix.copy()
+            references.append((getattr(board, operation)(), board.value_matrix))
+        results = getattr(batch, operation)(games)
+        for i, (result, matrix) in enumerate(references):
+            assert results[i] == result, (operation, i)
+            assert (batch.boards[i] == matrix).all(), (operation, i)
+    print('batch engine: %d random and pathological boards match Board' % boards)
+
+
+def _benchmark(games=4096, seconds=3.0):
+    """
+    Play games with random actions on a BatchEngine (restarting the
+    games that are over) and print the number of locks per second.
+    """
+    rng = np.random.default_rng(1)
+    batch = BatchEngine(games, seeds=range(games))
+    locks = 0
+    start_time = time.perf_counter()
+    while time.perf_counter() - start_time < seconds:
+        placed = batch.pieces_placed.sum()
+        for column in random_actions(rng, games).T:
+            batch.step(column)
+        locks += batch.pieces_placed.sum() - placed
+        batch.restart(np.flatnonzero(batch.game_over))
+    elapsed = time.perf_counter() - start_time
+    print('batch engine: %d games, %d locks in %.2f s: %.0f locks/s'
+          % (games, locks, elapsed, locks / elapsed))
+
+
+def _main():
+    """
+    Check the batch engine against the engine and measure its speed.
+    """
+    _check_board_operations()
+    _check_against_engine()
+    _benchmark()
+
+
+if __name__ == '__main__':
+    _main()
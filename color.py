@@ -13,6 +13,9 @@ class Color:
     A Color object models an RGB color.
     """
 
+    # Only the components are stored in each Color object.
+    __slots__ = ('_r', '_g', '_b')
+
     # -------------------------------------------------------------------
 
     def __init__(self, r=0, g=0, b=0):
@@ -0,0 +1,1441 @@
+import random  # used for the random seeds and the random policy
+import heapq  # used for ordering the merges of the columns
+import numpy as np  # fundamental Python module for scientific computing
+import time  # used for measuring the simulation speed
+
+# The engine module is a headless (pure logic) version of the game. It never
+# imports stddraw or pygame and never waits, so that games can be simulated
+# quickly for balancing the game and evaluating bots (a couple of hundred random
+# games per second on one core, and thousands with the vectorized games of
+# batch_engine).
+
+# types (shapes) of the tetrominoes, the size n of their n x n tile matrices and
+# their occupied cells as (column_index, row_index) in the initial orientation
+SHAPES = {
+    'I': (4, [(1, 0), (1, 1), (1, 2), (1, 3)]),
+    'O': (2, [(0, 0), (1, 0), (0, 1), (1, 1)]),
+    'Z': (3, [(0, 0), (1, 0), (1, 1), (2, 1)]),
+    'S': (3, [(0, 1), (1, 1), (1, 0), (2, 0)]),
+    'L': (3, [(1, 0), (1, 1), (1, 2), (2, 2)]),
+    'J': (3, [(0, 2), (1, 0), (1, 1), (1, 2)]),
+    'T': (3, [(0, 1), (1, 1), (2, 1), (1, 2)]),
+}
+TYPES = ['I', 'O', 'Z', 'S', 'L', 'J', 'T']
+# keys of the game that can be applied to the engine as actions
+ACTIONS = ['left', 'right', 'down', 'up', 'space']
+# horizontal shifts (wall kicks) tried in order when a rotated tetromino does
+# not fit on the grid where it is
+WALL_KICKS = {'I': (0, 1, -1, 2, -2)}
+DEFAULT_WALL_KICKS = (0, 1, -1)
+
+
+# Class used for storing the precomputed data of one orientation of a type
+class Orientation:
+    # Constructor that computes the data from the (row, col) indexes of the
+    # tiles in the n x n tile matrix
+    def __init__(self, n, cells, kicks):
+        self.n = n
+        self.cells = tuple(cells)
+        # (dx, dy) of each tile w.r.t. the bottom left cell of the matrix
+        self.offsets = tuple((col, n - 1 - row) for row, col in cells)
+        bottom, left, right = {}, {}, {}
+        for dx, dy in self.offsets:
+            bottom[dx] = min(dy, bottom.get(dx, dy))
+            left[dy] = min(dx, left.get(dy, dx))
+            right[dy] = max(dx, right.get(dy, dx))
+        # (dx, dy) of the bottommost tile of each column, and of the leftmost
+        # and the rightmost tiles of each row
+        self.bottom_profile = tuple(sorted(bottom.items()))
+        self.left_profile = tuple((dx, dy) for dy, dx in sorted(left.items()))
+        self.right_profile = tuple((dx, dy) for dy, dx in sorted(right.items()))
+        self.kicks = kicks
+        # leftmost and rightmost dx values of the tetromino, and the bit masks
+        # of its rows (bit dx - min_dx is set for each tile) that are used
+        # with the bitboards of the boards
+        self.min_dx = min(left.values())
+        self.max_dx = max(right.values())
+        masks = {}
+        for dx, dy in self.offsets:
+            masks[dy] = masks.get(dy, 0) | (1 << (dx - self.min_dx))
+        self.row_masks = tuple(sorted(masks.items()))
+        # the index of the first orientation of the type with the same cells up
+        # to a shift (set by build_rotation_tables), so that the placements of
+        # a tetromino with the same cells have the same (shape, x + min_dx,
+        # y + min_dy) key (see placement_key)
+        self.shape = None
+
+
+# Function that builds the 4 orientations of each type. The tiles are kept in
+# the same order in all orientations (the row-major order of the initial tile
+# matrix), and each orientation is the previous one rotated clockwise.
+def build_rotation_tables():
+    tables = {}
+    for type, (n, occupied_tiles) in SHAPES.items():
+        cells = sorted((row, col) for col, row in occupied_tiles)
+        kicks = WALL_KICKS.get(type, DEFAULT_WALL_KICKS)
+        tables[type] = []
+        for rotation in range(4):
+            tables[type].append(Orientation(n, cells, kicks))
+            cells = [(col, n - 1 - row) for row, col in cells]
+        # the orientations with the same cells up to a shift share a shape
+        shapes = []
+        for orientation in tables[type]:
+            shape = frozenset((dx - orientation.min_dx, dy - orientation.row_masks[0][0])
+                              for dx, dy in orientation.offsets)
+            if shape not in shapes:
+                shapes.append(shape)
+            orientation.shape = shapes.index(shape)
+    return tables
+
+
+ROTATION_TABLES = build_rotation_tables()
+
+
+# Function to check if a tetromino with the given orientation and bottom left
+# cell (x, y) can be moved in the given direction on the board. Rows and
+# columns of the tetromino above the board are not checked for collisions.
+def can_move(board, orientation, x, y, dir):
+    if board.row_bits is not None:
+        return can_move_bits(board, orientation, x, y, dir)
+    m = board.value_matrix
+    h = board.grid_height
+    if dir == "left":
+        for dx, dy in orientation.left_profile:
+            if x + dx == 0:
+                return False
+            if y + dy < h and m[y + dy, x + dx - 1] != 0:
+                return False
+    elif dir == "right":
+        for dx, dy in orientation.right_profile:
+            if x + dx == board.grid_width - 1:
+                return False
+            if y + dy < h and m[y + dy, x + dx + 1] != 0:
+                return False
+    else:  # dir == "down"
+        for dx, dy in orientation.bottom_profile:
+            if y + dy > h:
+                continue
+            if y + dy == 0:
+                return False
+            if y + dy - 1 < h and m[y + dy - 1, x + dx] != 0:
+                return False
+    return True
+
+
+# Function that does the same check with can_move by using the bitboard of the
+# board: the shifted row masks of the tetromino are ANDed with the board rows
+def can_move_bits(board, orientation, x, y, dir):
+    row_bits = board.row_bits
+    h = board.grid_height
+    if dir == "left":
+        if x + orientation.min_dx == 0:
+            return False
+        x -= 1
+    elif dir == "right":
+        if x + orientation.max_dx == board.grid_width - 1:
+            return False
+        x += 1
+    else:  # dir == "down"
+        if y + orientation.row_masks[0][0] == 0:
+            return False
+        y -= 1
+    shift = x + orientation.min_dx
+    for dy, mask in orientation.row_masks:
+        if y + dy < h and row_bits[y + dy] & (mask << shift):
+            return False
+    return True
+
+
+# Function to check if a tetromino with the given orientation fits on the board
+# when its bottom left cell is at (x, y)
+def fits(board, orientation, x, y):
+    if board.row_bits is not None:
+        if x + orientation.min_dx < 0 or x + orientation.max_dx >= board.grid_width:
+            return False
+        if y + orientation.row_masks[0][0] < 0:
+            return False
+        shift = x + orientation.min_dx
+        for dy, mask in orientation.row_masks:
+            if y + dy < board.grid_height and board.row_bits[y + dy] & (mask << shift):
+                return False
+        return True
+    m = board.value_matrix
+    h, w = board.grid_height, board.grid_width
+    for dx, dy in orientation.offsets:
+        if x + dx < 0 or x + dx >= w or y + dy < 0:
+            return False
+        if y + dy < h and m[y + dy, x + dx] != 0:
+            return False
+    return True
+
+
+# Function that returns (rotation, x) of a tetromino with the given type after
+# rotating it clockwise by using the first wall kick that fits on the board,
+# or None if the tetromino cannot be rotated
+def find_rotation(board, type, rotation, x, y):
+    rotation = (rotation + 1) % 4
+    orientation = ROTATION_TABLES[type][rotation]
+    for kick in orientation.kicks:
+        if fits(board, orientation, x + kick, y):
+            return rotation, x + kick
+    return None
+
+
+# Function that returns all the placements that a tetromino with the given type
+# can reach from its orientation (rotation) and bottom left cell (x, y) on the
+# board by moving and rotating, as (rotation, x, y) tuples of the positions where
+# it cannot move down anymore. Placements with the same cells are returned once.
+#
+# Every state in which no tile of the tetromino is below the top of its column
+# (an open state) is reachable by dropping the tetromino straight down from
+# above the stack, where it can take every orientation and horizontal position.
+# So when the tetromino is above the stack, the straight drops are found from
+# the column heights, and only the states under the overhangs (the ones that
+# are entered by moving or rotating from an open state) are searched one by
+# one. Otherwise all the states reachable from the given one are searched.
+def find_placements(board, type, rotation, x, y):
+    # the states are checked on the bitboard (made for a copy of the board if
+    # the board does not keep one)
+    if board.row_bits is None:
+        board = board.copy()
+        board.row_bits = []
+        board.update_bitboard()
+    heights = board.column_heights.tolist()
+    orientations = ROTATION_TABLES[type]
+    if y < max(heights):
+        return search_placements(board, type, [(rotation, x, y)], lambda *state: False)
+    # the highest empty cell below the top of each column (-1 if there is none)
+    rows = np.arange(board.grid_height)[:, None]
+    holes = np.where((board.value_matrix == 0) & (rows < board.column_heights),
+                     rows, -1).max(axis=0).tolist()
+    # for each orientation and x: the y at which the tetromino lands when it is
+    # dropped straight down, which is also the lowest y of its open states, and
+    # the y above which none of its tiles can be in a hole (the maxima over the
+    # tiles are taken on the shifted height and hole lists of all the xs at once)
+    landings, hole_tops, open_tops = [], [], []
+    for orientation in orientations:
+        x0, x1 = -orientation.min_dx, board.grid_width - orientation.max_dx
+        xs = range(x0, x1)
+        landings.append(dict(zip(xs, map(max, zip(*(
+            [height - dy for height in heights[x0 + dx:x1 + dx]]
+            for dx, dy in orientation.bottom_profile))))))
+        hole_tops.append(dict(zip(xs, map(max, zip(*(
+            [hole - dy + 1 for hole in holes[x0 + dx:x1 + dx]]
+            for dx, dy in orientation.offsets))))))
+        # the y below which the states are not open and have a tile in a hole
+        open_tops.append({x: min(landings[-1][x], hole_tops[-1][x]) for x in xs})
+
+    placements, entries = [], []
+    for rotation, orientation in enumerate(orientations):
+        landing, open_top = landings[rotation], open_tops[rotation]
+        next_open_top = open_tops[(rotation + 1) % 4]
+        kicks = orientations[(rotation + 1) % 4].kicks
+        # (the straight drops of the orientations with the same shape as an
+        # earlier one have the same cells)
+        if orientation.shape == rotation:
+            placements.extend((rotation, x, y) for x, y in landing.items())
+        # only the open states below the highest top of the states with a tile
+        # in a hole (usually none, since the holes are deep in the stack) can
+        # enter them
+        deepest = max(max(open_top.values()), max(next_open_top.values()))
+        for x, y in landing.items():
+            if y >= deepest:
+                continue
+            # moving left or right from an open state to a state that is not
+            # open (below the landing y there) with a tile in a hole
+            for nx in (x - 1, x + 1):
+                if nx in landing:
+                    for ny in range(y, open_top[nx]):
+                        if fits(board, orientation, nx, ny):
+                            entries.append((rotation, nx, ny))
+            # rotating from an open state in the same way (the rotated
+            # tetromino is pushed by one of the wall kicks)
+            top = max((next_open_top[x + kick] for kick in kicks
+                       if x + kick in next_open_top), default=y)
+            for ny in range(y, top):
+                rotated = find_rotation(board, type, rotation, x, ny)
+                if rotated is not None and ny < landings[rotated[0]][rotated[1]]:
+                    entries.append(rotated + (ny,))
+
+    def is_open(rotation, x, y):
+        return y >= landings[rotation][x]
+
+    # (the placements found by the search are not open, so their cells differ
+    # from the cells of the straight drops)
+    return placements + search_placements(board, type, entries, is_open)
+
+
+# Function that searches the states (rotation, x, y) of a tetromino with the
+# given type that are reachable from the given states by moving and rotating
+# it, except the ones for which skip(rotation, x, y) is True, and returns the
+# placements among them (the states in which it cannot move down)
+def search_placements(board, type, states, skip):
+    orientations = ROTATION_TABLES[type]
+    placements = []
+    seen = set(states)
+    stack = list(seen)
+    while stack:
+        rotation, x, y = state = stack.pop()
+        orientation = orientations[rotation]
+        next_states = []
+        if can_move(board, orientation, x, y, "down"):
+            next_states.append((rotation, x, y - 1))
+        else:
+            placements.append(state)
+        if can_move(board, orientation, x, y, "left"):
+            next_states.append((rotation, x - 1, y))
+        if can_move(board, orientation, x, y, "right"):
+            next_states.append((rotation, x + 1, y))
+        rotated = find_rotation(board, type, rotation, x, y)
+        if rotated is not None:
+            next_states.append(rotated + (y,))
+        for next_state in next_states:
+            if next_state not in seen and not skip(*next_state):
+                seen.add(next_state)
+                stack.append(next_state)
+    return unique_placements(type, placements)
+
+
+# Function that returns a key of the placement (rotation, x, y) of a tetromino
+# with the given type, which is the same for the placements with the same cells
+def placement_key(type, rotation, x, y):
+    orientation = ROTATION_TABLES[type][rotation]
+    return orientation.shape, x + orientation.min_dx, y + orientation.row_masks[0][0]
+
+
+# Function that returns the given placements of a tetromino with the given type
+# without the ones that have the same cells with a previous one
+def unique_placements(type, placements):
+    unique, seen_keys = [], set()
+    for placement in placements:
+        key = placement_key(type, *placement)
+        if key not in seen_keys:
+            seen_keys.add(key)
+            unique.append(placement)
+    return unique
+
+
+# largest tile exponent with its own Zobrist keys (the larger ones share keys)
+MAX_EXPONENT = 31
+# the Zobrist keys for each (grid height, grid width) (see zobrist_keys)
+ZOBRIST_KEYS = {}
+
+
+# Function that returns the random 64-bit Zobrist keys of each (row, column,
+# exponent) for the boards with the given dimensions. The keys are the same in
+# every process, so that the hashes of the boards can be compared across games.
+def zobrist_keys(grid_h, grid_w):
+    if (grid_h, grid_w) not in ZOBRIST_KEYS:
+        rng = np.random.default_rng(2048)
+        keys = rng.integers(0, 2 ** 64, (grid_h, grid_w, MAX_EXPONENT + 1),
+                            dtype=np.uint64)
+        # the empty cells do not change the hash
+        keys[:, :, 0] = 0
+        ZOBRIST_KEYS[grid_h, grid_w] = keys
+    return ZOBRIST_KEYS[grid_h, grid_w]
+
+
+# Function that returns the Zobrist hash of the given value matrix from scratch:
+# the xor of the keys of the exponents on its cells
+def zobrist_hash(value_matrix):
+    rows, cols = np.nonzero(value_matrix)
+    return zobrist_xor(value_matrix.shape, rows, cols, value_matrix[rows, cols])
+
+
+# Function that returns the xor of the Zobrist keys of the given exponents at
+# the given rows and columns of a board with the given (height, width)
+def zobrist_xor(shape, rows, cols, exponents):
+    keys = zobrist_keys(*shape)[rows, cols, np.minimum(exponents, MAX_EXPONENT)]
+    return int(np.bitwise_xor.reduce(keys, initial=np.uint64(0)))
+
+
+# Function that returns the bitmask of the occupied cells of each row of the
+# given value matrix (bit x set for the tile on column x) as a list of ints
+def row_masks(value_matrix):
+    w = value_matrix.shape[1]
+    # (int64 holds the masks of the boards narrower than 63 columns)
+    bits = np.left_shift(1, np.arange(w), dtype=np.int64 if w < 63 else object)
+    return ((value_matrix != 0) @ bits).tolist()
+
+
+# Function that returns the bitmasks of the tiles that are connected to the
+# bottom row through their 4-connected neighbors, given the bitmasks of the
+# occupied cells of each row (see row_masks). The rows are swept up and down
+# until no more tiles are connected, and on each row the tiles next to the
+# connected ones are connected by shifting their mask.
+def connected_rows(masks):
+    h = len(masks)
+    connected = [masks[0]] + [0] * (h - 1)
+    # (the rows above the topmost tile are empty)
+    top = h
+    while top > 1 and masks[top - 1] == 0:
+        top -= 1
+    sweep = list(range(1, top)) + list(range(top - 2, -1, -1))
+    changed = True
+    while changed:
+        changed = False
+        for y in sweep:
+            mask = masks[y]
+            if mask == 0:
+                continue
+            neighbors = connected[y - 1] if y > 0 else 0
+            if y + 1 < h:
+                neighbors |= connected[y + 1]
+            bits = connected[y] | (neighbors & mask)
+            while True:
+                spread = (bits | bits << 1 | bits >> 1) & mask
+                if spread == bits:
+                    break
+                bits = spread
+            if bits != connected[y]:
+                connected[y] = bits
+                changed = True
+    return connected
+
+
+# Class used for modelling the game grid without drawing it. Each cell of the
+# value matrix stores the log2 of the number on its tile (0 for empty cells).
+class Board:
+    # Constructor for creating an empty board with the given dimensions. The
+    # bitboard (one int per row with bit x set for each occupied cell x) is
+    # kept only when use_bitboard is True, and then it is used for checking
+    # the moves and the rotations of the tetrominoes with bitwise operations.
+    def __init__(self, grid_h, grid_w, use_bitboard=False):
+        self.grid_height = grid_h
+        self.grid_width = grid_w
+        self.value_matrix = np.zeros((grid_h, grid_w), dtype=np.uint8)
+        self.game_over = False
+        self.row_bits = [0] * grid_h if use_bitboard else None
+        # (row, column) of the merges done by the last call of clear_2048
+        self.merges = []
+        # height of the stack of tiles in each column (1 + the row of the
+        # topmost tile, 0 for the empty columns)
+        self.column_heights = np.zeros(grid_w, dtype=np.int64)
+        # the Zobrist hash of the value matrix (the xor of the keys of the
+        # exponents on the cells, see zobrist_keys), which is updated with the
+        # cells changed by each operation
+        self.zobrist_keys = zobrist_keys(grid_h, grid_w)
+        self.hash = 0
+
+    # Method that returns a copy of the board (e.g. for trying the placements
+    # of a piece without changing the board)
+    def copy(self):
+        board = Board(self.grid_height, self.grid_width)
+        board.value_matrix = self.value_matrix.copy()
+        board.game_over = self.game_over
+        if self.row_bits is not None:
+            board.row_bits = list(self.row_bits)
+        board.column_heights = self.column_heights.copy()
+        board.hash = self.hash
+        return board
+
+    # Method used for checking whether the cell with given row and column indexes
+    # is inside the board or not
+    def is_inside(self, row, col):
+        if row < 0 or row >= self.grid_height:
+            return False
+        if col < 0 or col >= self.grid_width:
+            return False
+        return True
+
+    # Method used for checking whether the cell with given row and column
+    # indexes is occupied by a tile or empty (cells out of the board are empty)
+    def is_occupied(self, row, col):
+        if not self.is_inside(row, col):
+            return False
+        return self.value_matrix[row, col] != 0
+
+    # Method for placing a tile with the given exponent on the cell with the
+    # given row and column (inside the board), which also updates the hash, the
+    # column height and the bitboard for the cell
+    def place_tile(self, row, col, exponent):
+        keys = self.zobrist_keys[row, col]
+        self.hash ^= int(keys[min(self.value_matrix[row, col], MAX_EXPONENT)]) ^ \
+            int(keys[min(exponent, MAX_EXPONENT)])
+        self.value_matrix[row][col] = exponent
+        if row >= self.column_heights[col]:
+            self.column_heights[col] = row + 1
+        if self.row_bits is not None:
+            self.row_bits[row] |= 1 << col
+
+    # Method for placing the tiles of a stopped piece onto the board. Returns
+    # True when the game is over due to having tiles above the topmost row.
+    def update_grid(self, piece):
+        for x, y, exponent in piece.get_tiles():
+            if self.is_inside(y, x):
+                self.place_tile(y, x, exponent)
+            # the game is over if any placed tile is out of the board
+            else:
+                self.game_over = True
+        return self.game_over
+
+    # Method for clearing the full rows and moving the upper rows down. Returns
+    # the number of cleared rows.
+    def clear(self):
+        # a row is full when none of its cells is 0
+        is_full = self.value_matrix.all(axis=1)
+        number_of_pushes = int(np.count_nonzero(is_full))
+        # nothing to do (or to copy) in the common case without full rows
+        if number_of_pushes == 0:
+            return 0
+        # the rows from the lowest full row up are changed
+        changed = int(is_full.argmax())
+        self.hash ^= self.region_hash(changed)
+        # keep the remaining rows in order at the bottom and empty the rest
+        remaining_rows = self.value_matrix[~is_full]
+        self.value_matrix[:len(remaining_rows)] = remaining_rows
+        self.value_matrix[len(remaining_rows):] = 0
+        self.hash ^= self.region_hash(changed)
+        self.update_heights()
+        self.update_bitboard()
+        return number_of_pushes
+
+    # Method for merging vertically adjacent tiles with the same number as in
+    # 2048. The merges are stored in self.merges as (row, column) pairs in the
+    # order of the game (the lowest pair first and the scan restarting after
+    # each merge). Returns the sum of the numbers on the merged tiles.
+    def clear_2048(self):
+        self.merges = []
+        counter = 0
+        for y, x, exponent in self.merge_columns():
+            self.merges.append((y, x))
+            counter += 1 << exponent
+        return counter
+
+    # Method that merges the lowest pair of every column until no pair is left.
+    # The columns with a pair are found on the whole value matrix at once, and
+    # each of them is merged on a list (a column is too short for the NumPy
+    # overhead of the small steps to pay off). Merges in different columns do
+    # not affect each other, so the per column merges are then interleaved in
+    # the order in which a scan from the bottom row (restarted after each
+    # merge) would find them. Returns a list of (row, column, exponent after
+    # the merge) tuples.
+    def merge_columns(self):
+        m = self.value_matrix
+        h = self.grid_height
+        lower, upper = m[:-1], m[1:]
+        xs = np.flatnonzero(((lower != 0) & (lower == upper)).any(axis=0)).tolist()
+        if not xs:
+            return []
+        column_merges = [[] for _ in range(self.grid_width)]
+        # (the cells of the merged columns are changed)
+        self.hash ^= self.region_hash(0, xs)
+        columns = m[:, xs].T.tolist()
+        for x, column in zip(xs, columns):
+            y = 0
+            while y < h - 1:
+                exponent = column[y]
+                if exponent == 0 or exponent != column[y + 1]:
+                    y += 1
+                    continue
+                column[y] = exponent + 1
+                column_merges[x].append((y, exponent + 1))
+                # the tiles above the pair (except the topmost one) go down by
+                # 1, the cell freed by this shift (or by the merge) is empty
+                if y == h - 2:
+                    column[h - 1] = 0
+                else:
+                    column[y + 1:h - 2] = column[y + 2:h - 1]
+                    column[h - 2] = 0
+                # the merged tile may make a pair with the tile below it
+                y = max(y - 1, 0)
+        m[:, xs] = np.array(columns, dtype=m.dtype).T
+        self.hash ^= self.region_hash(0, xs)
+        self.update_heights(xs)
+        self.update_bitboard()
+        # interleave the merges by the (row, column) at which each one happens
+        heads = [(merges[0][0], x, 0) for x, merges in enumerate(column_merges)
+                 if merges]
+        heapq.heapify(heads)
+        ordered_merges = []
+        while heads:
+            y, x, i = heapq.heappop(heads)
+            ordered_merges.append((y, x, column_merges[x][i][1]))
+            if i + 1 < len(column_merges[x]):
+                heapq.heappush(heads, (column_merges[x][i + 1][0], x, i + 1))
+        return ordered_merges
+
+    # Method for merging the tile at (y + 1, x) into the tile at (y, x). Returns
+    # the number on the merged tile.
+    def merge_pair(self, y, x):
+        self.hash ^= self.region_hash(y, [x])
+        self.value_matrix[y + 1][x] = 0
+        self.value_matrix[y][x] += 1
+        # the tiles above the merged pair (except the topmost one) go down
+        for i in range(y + 2, self.grid_height - 1):
+            if self.value_matrix[i][x] != 0:
+                self.value_matrix[i - 1][x] = self.value_matrix[i][x]
+                self.value_matrix[i][x] = 0
+        self.hash ^= self.region_hash(y, [x])
+        self.update_heights([x])
+        self.update_bitboard()
+        return 1 << int(self.value_matrix[y][x])
+
+    # Method that returns the (row, column) of the lowest tile having the same
+    # number with the tile above it, or None if there is no such tile
+    def find_pair(self):
+        for y in range(self.grid_height - 1):
+            for x in range(self.grid_width):
+                value = self.value_matrix[y][x]
+                if value != 0 and value == self.value_matrix[y + 1][x]:
+                    return y, x
+        return None
+
+    # Method for deleting the tiles that are not connected to the bottom row
+    # through their 4-connected neighbors. A flood fill on the rows as bitmasks
+    # (the bitboard when it is kept, see connected_rows) finds the connected
+    # tiles without visiting them one by one. Returns the sum of the numbers
+    # on the deleted tiles.
+    def delete_floating(self):
+        masks = self.row_bits if self.row_bits is not None else \
+            row_masks(self.value_matrix)
+        connected = connected_rows(masks)
+        if connected == masks:
+            return 0
+        rows, cols = [], []
+        for y, (mask, bits) in enumerate(zip(masks, connected)):
+            floating = mask & ~bits
+            x = 0
+            while floating:
+                if floating & 1:
+                    rows.append(y)
+                    cols.append(x)
+                floating >>= 1
+                x += 1
+        exponents = self.value_matrix[rows, cols]
+        to_add = int(np.left_shift(1, exponents.astype(np.int64)).sum())
+        self.hash ^= zobrist_xor(self.value_matrix.shape, rows, cols, exponents)
+        self.value_matrix[rows, cols] = 0
+        self.update_heights(sorted(set(cols)))
+        if self.row_bits is not None:
+            self.row_bits = connected
+        return to_add
+
+    # Method for merging, clearing and deleting the floating tiles until nothing
+    # changes (after a piece is placed). Returns the number of the cleared rows
+    # and the sum of the numbers on the merged and the deleted tiles.
+    def resolve(self):
+        total_cleared, total_combined = 0, 0
+        while True:
+            cleared_2048 = self.clear_2048()
+            total_combined += cleared_2048
+            cleared = self.clear()
+            total_cleared += cleared
+            # a placed piece rests on the stack, so only the merges and the
+            # clears (or a placement out of the board) leave floating tiles
+            if cleared + cleared_2048 != 0 or self.game_over:
+                total_combined += self.delete_floating()
+            if cleared + cleared_2048 == 0:
+                return total_cleared, total_combined
+
+    # Method for recomputing the heights of the given columns (all columns by
+    # default) after their tiles are removed or moved down
+    def update_heights(self, columns=None):
+        if columns is None:
+            columns = slice(None)
+        occupied = self.value_matrix[:, columns] != 0
+        # index of the topmost tile counted from the top row of the board
+        from_top = occupied[::-1].argmax(axis=0)
+        self.column_heights[columns] = np.where(
+            occupied.any(axis=0), self.grid_height - from_top, 0)
+
+    # Method that returns the xor of the Zobrist keys of the cells on the rows
+    # from the given row up (on the given columns, all columns by default)
+    def region_hash(self, row, columns=None):
+        region = self.value_matrix[row:] if columns is None else \
+            self.value_matrix[row:, columns]
+        rows, cols = np.nonzero(region)
+        exponents = region[rows, cols]
+        if columns is not None:
+            cols = np.asarray(columns)[cols]
+        return zobrist_xor(self.value_matrix.shape, rows + row, cols, exponents)
+
+    # Method for recomputing the hash from the value matrix (e.g. after the
+    # value matrix is changed as a whole)
+    def update_hash(self):
+        self.hash = zobrist_hash(self.value_matrix)
+
+    # Method that returns True if the hash is equal to the hash recomputed
+    # from the value matrix (for checking the updates when debugging)
+    def check_hash(self):
+        return self.hash == zobrist_hash(self.value_matrix)
+
+    # Method for recomputing the bitboard (if it is used) from the value matrix
+    def update_bitboard(self):
+        if self.row_bits is None:
+            return
+        self.row_bits = row_masks(self.value_matrix)
+
+    # Method that returns how many rows the tiles at the given (x, y) cells can
+    # fall down before landing on the stack or the bottom of the board
+    def drop_distance(self, cells):
+        # the lowest cell of the piece in each column is the one that lands
+        lowest = {}
+        for x, y in cells:
+            if x not in lowest or y < lowest[x]:
+                lowest[x] = y
+        distance = None
+        for x, y in lowest.items():
+            height = int(self.column_heights[x])
+            if y >= height:
+                gap = y - height
+            # the cell is below the top of the stack (under an overhang)
+            else:
+                occupied_rows = np.flatnonzero(self.value_matrix[:y, x])
+                gap = y - 1 - int(occupied_rows[-1]) if len(occupied_rows) else y
+            if distance is None or gap < distance:
+                distance = gap
+        return distance
+
+
+# Class used for representing a tetromino without Tile objects. The piece is
+# given by its type, the index of its orientation in the rotation tables, the
+# position (x, y) of the bottom left cell of its n x n matrix on the board and
+# the log2 of its tile numbers (in the order of the cells of the tables).
+class Piece:
+    # Constructor to create a piece with a given type above the board at the
+    # given horizontal position x (e.g. from a PieceGenerator)
+    def __init__(self, type, grid_height, grid_width, x):
+        self.type = type
+        self.grid_height = grid_height
+        self.grid_width = grid_width
+        self.rotation = 0
+        orientation = ROTATION_TABLES[type][0]
+        self.exponents = [1] * len(orientation.cells)  # number 2 on each tile
+        self.x = x
+        self.y = grid_height
+
+    # Method that returns a copy of the piece
+    def copy(self):
+        piece = Piece(self.type, self.grid_height, self.grid_width, self.x)
+        piece.rotation, piece.y = self.rotation, self.y
+        piece.exponents = list(self.exponents)
+        return piece
+
+    # Method that returns (x, y, exponent) of each tile of the piece on the board
+    def get_tiles(self):
+        offsets = ROTATION_TABLES[self.type][self.rotation].offsets
+        return [(self.x + dx, self.y + dy, exponent)
+                for (dx, dy), exponent in zip(offsets, self.exponents)]
+
+    # Method for moving the piece in a given direction by 1 on the board
+    def move(self, direction, board):
+        if not self.can_be_moved(direction, board):
+            return False
+        if direction == "left":
+            self.x -= 1
+        elif direction == "right":
+            self.x += 1
+        else:  # direction == "down"
+            self.y -= 1
+        return True
+
+    # Method for dropping the piece at once to where it lands on the board.
+    # Returns the number of rows it has fallen.
+    def hard_drop(self, board):
+        orientation = ROTATION_TABLES[self.type][self.rotation]
+        drop_distance = board.drop_distance(
+            [(self.x + dx, self.y + dy) for dx, dy in orientation.bottom_profile])
+        self.y -= drop_distance
+        return drop_distance
+
+    # Method to check if the piece can be moved in the given direction or not
+    def can_be_moved(self, dir, board):
+        orientation = ROTATION_TABLES[self.type][self.rotation]
+        return can_move(board, orientation, self.x, self.y, dir)
+
+    # Method that returns the placements (rotation, x, y) that the piece can
+    # reach on the board (see find_placements)
+    def get_placements(self, board):
+        return find_placements(board, self.type, self.rotation, self.x, self.y)
+
+    # Method for rotating the piece clockwise (by trying the wall kicks of the
+    # rotation tables). Returns False if the piece cannot be rotated.
+    def rotate(self, board):
+        rotation = find_rotation(board, self.type, self.rotation, self.x, self.y)
+        if rotation is None:
+            return False
+        self.rotation, self.x = rotation
+        return True
+
+
+# Class used for generating the pieces of a game (the type, the horizontal spawn
+# position and the log2 of the tile numbers of each piece) from its own seeded
+# random number generator, so that a game can be reproduced from its seed and
+# games can be simulated in parallel with independent streams. The pieces are
+# generated in blocks of NumPy arrays, which also gives the next pieces as
+# arrays for simulating many games at once.
+class PieceGenerator:
+    # number of the pieces generated at once (the stream of the pieces depends
+    # only on the seed, and not on how many pieces are asked for at once)
+    block_size = 256
+
+    # Constructor that creates a generator with the given seed (a random seed
+    # if it is None) for a board with the given width
+    def __init__(self, seed=None, grid_width=12):
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        self.seed = seed
+        self.grid_width = grid_width
+        self.rng = np.random.default_rng(seed)
+        # the largest horizontal spawn position for each type (by its index)
+        self.max_x = np.array([grid_width - SHAPES[type][0] for type in TYPES])
+        # the current block of the generated pieces (the indexes of the types in
+        # TYPES, the spawn positions and the exponents of the 4 tiles in the
+        # order of the cells of the rotation tables) and the index of the next
+        # piece in the block
+        self.types, self.xs, self.exponents = None, None, None
+        self.index = self.block_size
+        # number of the blocks generated so far
+        self.blocks = 0
+
+    # Method for generating the next block of pieces
+    def generate_block(self):
+        types = self.rng.integers(0, len(TYPES), self.block_size)
+        self.xs = self.rng.integers(0, self.max_x[types] + 1).astype(np.int16)
+        self.exponents = self.rng.integers(1, 3, (self.block_size, 4), dtype=np.uint8)
+        self.types = types.astype(np.uint8)
+        self.index = 0
+        self.blocks += 1
+
+    # Method that returns the number of the pieces generated so far
+    def position(self):
+        return (self.blocks - 1) * self.block_size + self.index
+
+    # Method for going back or forward to the given position in the stream of
+    # the pieces (the number of the pieces generated before the next piece)
+    def seek(self, position):
+        self.rng = np.random.default_rng(self.seed)
+        self.index = self.block_size
+        self.blocks = 0
+        while self.blocks * self.block_size < position:
+            self.generate_block()
+        if self.blocks > 0:
+            self.index = position - (self.blocks - 1) * self.block_size
+
+    # Method that returns the next piece as (type, x, exponents)
+    def next_piece(self):
+        if self.index == self.block_size:
+            self.generate_block()
+        i = self.index
+        self.index += 1
+        return (TYPES[self.types[i]], int(self.xs[i]),
+                self.exponents[i].tolist())
+
+    # Method that returns the next n pieces at once as the arrays of the type
+    # indexes (n,), the spawn positions (n,) and the tile exponents (n, 4)
+    def batch(self, n):
+        types, xs, exponents = [], [], []
+        while n > 0:
+            if self.index == self.block_size:
+                self.generate_block()
+            end = min(self.block_size, self.index + n)
+            types.append(self.types[self.index:end])
+            xs.append(self.xs[self.index:end])
+            exponents.append(self.exponents[self.index:end])
+            n -= end - self.index
+            self.index = end
+        if not types:
+            return (np.zeros(0, np.uint8), np.zeros(0, np.int16),
+                    np.zeros((0, 4), np.uint8))
+        return np.concatenate(types), np.concatenate(xs), np.concatenate(exponents)
+
+
+# Class used for simulating a whole game: the board, the current and the next
+# pieces, locking the pieces and the scoring (as Tetris_2048.start does)
+class Engine:
+    # Constructor for creating a new game with the given board dimensions (the
+    # board keeps a bitboard for fast move checks unless use_bitboard is False)
+    # and the pieces generated with the given seed (a random seed if None)
+    def __init__(self, grid_h=20, grid_w=12, use_bitboard=True, seed=None):
+        self.grid_height = grid_h
+        self.grid_width = grid_w
+        self.use_bitboard = use_bitboard
+        self.generator = PieceGenerator(seed, grid_w)
+        self.reset()
+
+    # Method for restarting the game with an empty board and zero score
+    def reset(self):
+        self.board = Board(self.grid_height, self.grid_width, self.use_bitboard)
+        self.score = 0
+        self.cleared = 0
+        self.combined = 0
+        self.pieces_placed = 0
+        self.game_over = False
+        self.next_piece = self.create_piece()
+        self.spawn()
+
+    # Method for creating the next piece of the generator
+    def create_piece(self):
+        piece_type, x, exponents = self.generator.next_piece()
+        piece = Piece(piece_type, self.grid_height, self.grid_width, x)
+        piece.exponents = exponents
+        return piece
+
+    # Method for making the next piece the current one. As in the game, the
+    # piece is moved once after spawning and locked if it cannot go down.
+    def spawn(self):
+        self.current_piece = self.next_piece
+        self.next_piece = self.create_piece()
+        if not self.current_piece.move("down", self.board):
+            self.lock()
+
+    # Method for applying a key of the game ('left', 'right', 'down', 'up' or
+    # 'space') to the current piece. Returns False if the game is over.
+    def step(self, action):
+        if self.game_over:
+            return False
+        if action == "up":
+            self.current_piece.rotate(self.board)
+        elif action == "space":
+            self.current_piece.hard_drop(self.board)
+            self.lock()
+        else:
+            self.current_piece.move(action, self.board)
+        return not self.game_over
+
+    # Method for moving the current piece down by 1 as the game does after each
+    # period of time. The piece is locked when it cannot go down anymore.
+    def tick(self):
+        if self.game_over:
+            return False
+        if not self.current_piece.move("down", self.board):
+            self.lock()
+        return not self.game_over
+
+    # Method for placing the current piece on the board, merging and clearing
+    # the tiles until nothing changes, updating the score and spawning the next
+    # piece. Returns True when the game is over.
+    def lock(self):
+        game_over = self.board.update_grid(self.current_piece)
+        self.pieces_placed += 1
+        cleared, combined = self.board.resolve()
+        self.cleared += cleared
+        self.combined += combined
+        self.score = self.cleared * 100 + self.combined
+        if game_over:
+            self.game_over = True
+        else:
+            self.spawn()
+        return self.game_over
+
+    # Method for playing the game until it is over (or max_pieces pieces are
+    # placed) by asking the given policy for the actions. The policy is called
+    # with the engine and returns a list of actions that ends by locking the
+    # current piece. The given on_piece function (if any) is called with the
+    # engine after each piece is placed (e.g. for collecting statistics).
+    # Returns the final score.
+    def play(self, policy, max_pieces=None, on_piece=None):
+        while not self.game_over:
+            if max_pieces is not None and self.pieces_placed >= max_pieces:
+                break
+            placed = self.pieces_placed
+            for action in policy(self):
+                self.step(action)
+            # make sure that the piece is locked even if the policy did not
+            if self.pieces_placed == placed and not self.game_over:
+                self.step("space")
+            if on_piece is not None:
+                on_piece(self)
+        return self.score
+
+
+# Function that returns the time in seconds between the moves of the current
+# piece down by gravity, which gets shorter as the score increases
+def fall_interval(score, game_speed=0.5):
+    return max(min(5, game_speed - (score / 150) * 0.025), 0.11)
+
+
+# Class used for running the game loop of Tetris_2048.start tick by tick: each
+# tick applies the key typed (if any), moves the current piece down when the
+# fall time is up and locks the piece when it could not move down, exactly as
+# the game does, so that a recorded game can be played back without drawing
+class TickEngine(Engine):
+    # Constructor for creating a new game with the given board dimensions, seed,
+    # number of ticks per second and game speed (as in Tetris_2048.start)
+    def __init__(self, grid_h=20, grid_w=12, seed=None, tick_rate=60, game_speed=0.5):
+        self.tick_rate = tick_rate
+        self.game_speed = game_speed
+        # debug modes of the game (only I tetrominoes, and only 512 tiles)
+        self.debug, self.debug2 = False, False
+        # the time passed since the current piece moved down by gravity, which
+        # is high at first so that the first piece moves at once
+        self.fall_time = 999
+        self.ticks = 0
+        super().__init__(grid_h, grid_w, True, seed)
+
+    # Method for starting the game (the game does not move the first piece
+    # down before the first tick)
+    def reset(self):
+        self.board = Board(self.grid_height, self.grid_width, self.use_bitboard)
+        self.score = 0
+        self.cleared = 0
+        self.combined = 0
+        self.pieces_placed = 0
+        self.game_over = False
+        self.current_piece = self.create_piece()
+        self.next_piece = self.create_piece()
+        # whether the current piece could move down the last time it was moved
+        # down by gravity (it is locked when it could not)
+        self.success = True
+
+    # Method for creating the next piece of the generator (as the debug modes
+    # of the game change it)
+    def create_piece(self):
+        piece_type, x, exponents = self.generator.next_piece()
+        if self.debug or self.debug2:
+            piece_type, x = 'I', min(x, self.grid_width - 4)
+        piece = Piece(piece_type, self.grid_height, self.grid_width, x)
+        piece.exponents = [9] * 4 if self.debug2 else exponents
+        return piece
+
+    # Method for making the next piece the current one and moving it down once
+    # (it is locked on the next tick if it could not move down)
+    def spawn(self):
+        self.current_piece = self.next_piece
+        self.next_piece = self.create_piece()
+        self.success = self.current_piece.move("down", self.board)
+
+    # Method for running one tick of the game with the given key typed (or
+    # None). Returns False if the game is over.
+    def run_tick(self, key=None):
+        if self.game_over:
+            return False
+        self.ticks += 1
+        piece = self.current_piece
+        if key in ("left", "right", "down"):
+            piece.move(key, self.board)
+        elif key == "space":
+            piece.hard_drop(self.board)
+            self.success = False
+        elif key == "up":
+            piece.rotate(self.board)
+        elif key == "r":
+            # the game removes the tiles of the current piece and clears the
+            # board, and then the piece is locked as usual
+            piece.exponents = []
+            self.board.value_matrix[:, :] = 0
+            self.board.update_heights()
+            self.board.update_bitboard()
+            self.board.update_hash()
+            self.score, self.cleared, self.combined = 0, 0, 0
+            self.debug, self.debug2 = False, False
+            self.success = False
+        elif key == "i":
+            self.debug = True
+        elif key == "b":
+            self.debug2 = True
+        elif key == "n":
+            self.debug, self.debug2 = False, False
+        # move the piece down by 1 after the fall time is up
+        self.fall_time += 1 / self.tick_rate
+        if self.fall_time >= fall_interval(self.score, self.game_speed):
+            self.success = piece.move("down", self.board)
+            self.fall_time = 0
+        if not self.success:
+            score = self.score
+            self.lock()
+            # the game does not update the score after the last lock
+            if self.game_over:
+                self.score = score
+        return not self.game_over
+
+    # Method for going on with a new board after the game is over (when y is
+    # typed on the game over screen)
+    def continue_game(self):
+        self.board = Board(self.grid_height, self.grid_width, self.use_bitboard)
+        self.score, self.cleared, self.combined = 0, 0, 0
+        self.game_over = False
+        self.debug, self.debug2 = False, False
+        self.spawn()
+
+
+# Policy that rotates and moves the current piece randomly and then drops it
+def random_policy(engine):
+    actions = ["up"] * random.randint(0, 3)
+    direction = random.choice(["left", "right"])
+    actions += [direction] * random.randint(0, engine.grid_width // 2)
+    actions.append("space")
+    return actions
+
+
+#-----------------------------------------------------------------------
+
+def _clear_2048_reference(board):
+    """
+    Merge the tiles of board one pair at a time by restarting the scan
+    from the bottom row after each merge (as GameGrid.clear_2048 used
+    to do). Return the sum of the merged numbers and the merges.
+    """
+    counter = 0
+    merges = []
+    while True:
+        pair = board.find_pair()
+        if pair is None:
+            return counter, merges
+        merges.append(pair)
+        counter += board.merge_pair(*pair)
+
+def _check_clear_2048(trials=2000):
+    """
+    Check on random boards with many equal neighbors that the column-wise
+    Board.clear_2048 gives the same board, score, merge order and hash as
+    the reference one.
+    """
+    rng = np.random.default_rng(2048)
+    for trial in range(trials):
+        h = int(rng.integers(2, 25))
+        w = int(rng.integers(1, 15))
+        matrix = rng.integers(0, 4, (h, w)).astype(np.uint8)
+        board, reference = Board(h, w), Board(h, w)
+        board.value_matrix = matrix.copy()
+        reference.value_matrix = matrix.copy()
+        board.update_hash()
+        reference.update_hash()
+        counter, merges = _clear_2048_reference(reference)
+        assert board.clear_2048() == counter, trial
+        assert board.merges == merges, trial
+        assert (board.value_matrix == reference.value_matrix).all(), trial
+        assert board.check_hash() and board.hash == reference.hash, trial
+    print('clear_2048: %d random boards match the reference' % trials)
+
+def _delete_floating_sweep(board):
+    """
+    Delete the tiles of board that are not connected to the bottom row
+    by using the label sweeps that GameGrid.delete_floating used to do.
+    Return the sum of the numbers on the deleted tiles.
+    """
+    h, w = board.grid_height, board.grid_width
+    m = board.value_matrix
+    labels = np.zeros((h, w), dtype=np.uint8)
+    to_add = 0
+    for y in range(h):
+        for x in range(w):
+            if m[y][x] != 0:
+                not_connected = True
+                if y == 0:
+                    labels[y][x] = 1
+                    if m[y + 1][x] != 0:
+                        labels[y + 1][x] = 1
+                    not_connected = False
+                elif labels[y][x] != 1:
+                    if x != 0:
+                        if m[y][x - 1] != 0 and labels[y][x - 1] == 1:
+                            labels[y][x] = 1
+                            if y + 1 < h and m[y + 1][x] != 0:
+                                labels[y + 1][x] = 1
+                            not_connected = False
+                    for i in range(x, w - 1):
+                        if m[y][i] != 0:
+                            if labels[y][i] == 1:
+                                labels[y][x] = 1
+                                if y + 1 < h and m[y + 1][x] != 0:
+                                    labels[y + 1][x] = 1
+                                not_connected = False
+                            else:
+                                continue
+                        break
+                else:
+                    not_connected = False
+                    if y + 1 < h and m[y + 1][x] != 0:
+                        labels[y + 1][x] = 1
+                if not_connected:
+                    labels[y][x] = 2
+
+    for y in reversed(range(1, h)):
+        for x in reversed(range(w)):
+            if m[y][x] != 0 and labels[y][x] == 1 and m[y - 1][x] != 0:
+                labels[y - 1][x] = 1
+
+    for y in range(h):
+        for x in range(w):
+            if m[y][x] != 0 and labels[y][x] == 2:
+                to_add += 1 << int(m[y][x])
+                m[y][x] = 0
+    return to_add
+
+def _pathological_boards(h=20, w=12):
+    """
+    Return a dict of boards that are hard for delete_floating: long
+    serpentine paths, tiles connected to the floor only by a path going
+    down and then up, and boards full of holes.
+    """
+    boards = {}
+    # a single path going up and down through every column
+    # (only the first column touches the floor)
+    snake = Board(h, w)
+    snake.value_matrix[1:, ::2] = 1
+    snake.value_matrix[0, 0] = 1
+    snake.value_matrix[h - 1, 1::4] = 2
+    snake.value_matrix[1, 3::4] = 2
+    boards['serpentine'] = snake
+    # a hook that goes up, right, down and then up again
+    hook = Board(h, w)
+    hook.value_matrix[0:h - 2, 0] = 1
+    hook.value_matrix[h - 2, 0:w // 2 + 1] = 1
+    hook.value_matrix[2:h - 2, w // 2] = 1
+    hook.value_matrix[2, w // 2:w - 1] = 1
+    hook.value_matrix[2:h - 4, w - 1] = 1
+    boards['down then up'] = hook
+    # every other cell of a full board is empty
+    checkers = Board(h, w)
+    checkers.value_matrix[:, :] = 1
+    checkers.value_matrix[1::2, 1::2] = 0
+    boards['holes'] = checkers
+    # many small islands with nothing on the floor
+    islands = Board(h, w)
+    islands.value_matrix[1::2, ::2] = 3
+    boards['islands'] = islands
+    return boards
+
+def _benchmark_delete_floating(repeats=200):
+    """
+    Compare the time and the result of the flood fill in
+    Board.delete_floating with the old label sweeps on the pathological
+    boards.
+    """
+    for name, board in _pathological_boards().items():
+        results = []
+        for delete in (Board.delete_floating, _delete_floating_sweep):
+            start_time = time.perf_counter()
+            for _ in range(repeats):
+                copy = Board(board.grid_height, board.grid_width)
+                copy.value_matrix = board.value_matrix.copy()
+                to_add = delete(copy)
+            elapsed = (time.perf_counter() - start_time) / repeats
+            results.append((to_add, elapsed * 1e6))
+        print('%-12s flood fill: %5d in %7.1f us   sweeps: %5d in %7.1f us'
+              % (name, results[0][0], results[0][1],
+                 results[1][0], results[1][1]))
+
+def _check_column_heights(games=20):
+    """
+    Play random games and check after each lock that the incrementally
+    updated column heights are equal to the ones computed from scratch.
+    """
+    engine = Engine()
+    for _ in range(games):
+        engine.reset()
+        while not engine.game_over:
+            for action in random_policy(engine):
+                engine.step(action)
+            board = engine.board
+            heights = board.column_heights.copy()
+            board.update_heights()
+            assert (heights == board.column_heights).all()
+    print('column heights: %d random games match the full recompute' % games)
+
+def _check_bitboard(games=5):
+    """
+    Play random games with a bitboard and check after each lock that the
+    bitboard is in sync with the value matrix, and that both backends of
+    can_move and fits give the same results for every orientation and
+    free position.
+    """
+    engine = Engine(use_bitboard=True)
+    checks = 0
+    for _ in range(games):
+        engine.reset()
+        while not engine.game_over:
+            for action in random_policy(engine):
+                engine.step(action)
+            board = engine.board
+            row_bits = board.row_bits
+            board.update_bitboard()
+            assert row_bits == board.row_bits
+            probe_board = Board(board.grid_height, board.grid_width)
+            probe_board.value_matrix = board.value_matrix
+            for type in TYPES:
+                for orientation in ROTATION_TABLES[type]:
+                    for x in range(-orientation.min_dx,
+                                   board.grid_width - orientation.max_dx):
+                        for y in range(board.grid_height + 1):
+                            # only the placements that a tetromino can have
+                            if not fits(probe_board, orientation, x, y):
+                                continue
+                            for dir in ("left", "right", "down"):
+                                assert can_move(board, orientation, x, y, dir) == \
+                                    can_move(probe_board, orientation, x, y, dir)
+                            for kick in orientation.kicks:
+                                assert fits(board, orientation, x + kick, y) == \
+                                    fits(probe_board, orientation, x + kick, y)
+                            checks += 1
+    print('bitboard: %d placements match the cell probes' % checks)
+
+def _benchmark_bitboard(repeats=20000):
+    """
+    Measure the time of can_move and fits with and without the bitboard
+    on a half full board.
+    """
+    rng = np.random.default_rng(9)
+    for use_bitboard in (False, True):
+        board = Board(20, 12, use_bitboard)
+        board.value_matrix[:10] = rng.integers(0, 2, (10, 12))
+        board.update_bitboard()
+        orientation = ROTATION_TABLES['T'][1]
+        start_time = time.perf_counter()
+        for _ in range(repeats):
+            can_move(board, orientation, 5, 10, "down")
+            can_move(board, orientation, 5, 10, "left")
+            fits(board, orientation, 5, 9)
+        elapsed = (time.perf_counter() - start_time) / repeats
+        print('bitboard=%-5s 2 moves + 1 fit in %.2f us'
+              % (use_bitboard, elapsed * 1e6))
+
+def _benchmark(games=200):
+    """
+    Play the given number of games with the random policy and print the
+    number of games and locks simulated per second.
+    """
+    engine = Engine()
+    locks = 0
+    start_time = time.perf_counter()
+    for _ in range(games):
+        engine.reset()
+        engine.play(random_policy)
+        locks += engine.pieces_placed
+    elapsed = time.perf_counter() - start_time
+    print('%d games, %d locks in %.2f s: %.1f games/s, %.0f locks/s'
+          % (games, locks, elapsed, games / elapsed, locks / elapsed))
+
+def _check_hash(games=20, ticks=5000, seed=25):
+    """
+    Play random games and check after each lock that the incrementally
+    updated hash of the board is equal to the one computed from scratch,
+    and do the same after each tick of a game played with random keys
+    (also restarting it) on a TickEngine.
+    """
+    random.seed(seed)
+    engine = Engine(seed=seed)
+    locks = 0
+    for _ in range(games):
+        engine.reset()
+        while not engine.game_over:
+            for action in random_policy(engine):
+                engine.step(action)
+            assert engine.board.check_hash()
+            locks += 1
+    engine = TickEngine(seed=seed)
+    keys = ACTIONS + ["space", "space", "r", None, None, None]
+    for tick in range(ticks):
+        if not engine.run_tick(random.choice(keys)):
+            engine.continue_game()
+        assert engine.board.check_hash(), tick
+    print('hash: %d locks and %d ticks match the full recompute' % (locks, ticks))
+
+
+def _check_piece_generator(seed=2048, pieces=1000):
+    """
+    Check that the pieces generated one by one are the same as the ones
+    generated in batches of various sizes, and that two games played
+    with the same seed and the same actions end the same.
+    """
+    generator = PieceGenerator(seed)
+    pieces_one_by_one = [generator.next_piece() for i in range(pieces)]
+    generator = PieceGenerator(seed)
+    batch_sizes = [1, 7, 300, 256, 0, 436]
+    types, xs, exponents = (np.concatenate(arrays) for arrays in
+                            zip(*[generator.batch(n) for n in batch_sizes]))
+    pieces_in_batches = [(TYPES[t], int(x), e.tolist())
+                         for t, x, e in zip(types, xs, exponents)]
+    assert pieces_one_by_one == pieces_in_batches
+    scores = []
+    for game in range(2):
+        random.seed(seed)
+        engine = Engine(seed=seed)
+        scores.append((engine.play(random_policy), engine.pieces_placed,
+                       engine.board.value_matrix.tobytes()))
+    assert scores[0] == scores[1]
+    print('piece generator: %d pieces match in batches, games are reproducible'
+          % pieces)
+
+
+def _random_states(engine, rng):
+    """
+    Return the state (rotation, x, y) of the current piece of the engine
+    and a random state of it above the stack.
+    """
+    piece = engine.current_piece
+    orientations = ROTATION_TABLES[piece.type]
+    rotation = rng.randrange(4)
+    orientation = orientations[rotation]
+    x = rng.randrange(-orientation.min_dx, engine.grid_width - orientation.max_dx)
+    y = int(engine.board.column_heights.max()) + rng.randrange(3)
+    return [(piece.rotation, piece.x, piece.y), (rotation, x, y)]
+
+def _cell_sets(type, placements):
+    return {frozenset((x + dx, y + dy) for dx, dy in ROTATION_TABLES[type][r].offsets)
+            for r, x, y in placements}
+
+def _check_placements(games=20, seed=23):
+    """
+    Play random games and check for the current piece (at its own state
+    and at a random state above the stack) that find_placements returns
+    the same cells as a search of all the reachable states, once each.
+    """
+    rng = random.Random(seed)
+    engine = Engine(seed=seed)
+    checks = 0
+    for _ in range(games):
+        engine.reset()
+        while not engine.game_over:
+            type = engine.current_piece.type
+            for rotation, x, y in _random_states(engine, rng):
+                if not fits(engine.board, ROTATION_TABLES[type][rotation], x, y):
+                    continue
+                placements = find_placements(engine.board, type, rotation, x, y)
+                reference = search_placements(engine.board, type, [(rotation, x, y)],
+                                              lambda *state: False)
+                assert len(_cell_sets(type, placements)) == len(placements)
+                assert _cell_sets(type, placements) == _cell_sets(type, reference)
+                checks += 1
+            for action in random_policy(engine):
+                engine.step(action)
+    print('placements: %d pieces match the search of all the states' % checks)
+
+
+def _benchmark_placements(games=20, seed=23):
+    """
+    Measure the time of find_placements and of a search of all the
+    reachable states for the current pieces of random games.
+    """
+    rng = random.Random(seed)
+    engine = Engine(seed=seed)
+    states = []
+    for _ in range(games):
+        engine.reset()
+        while not engine.game_over:
+            type = engine.current_piece.type
+            states.append((engine.board.copy(), type) + _random_states(engine, rng)[0])
+            for action in random_policy(engine):
+                engine.step(action)
+    start_time = time.perf_counter()
+    n = sum(len(find_placements(*state)) for state in states)
+    elapsed = (time.perf_counter() - start_time) / len(states)
+    start_time = time.perf_counter()
+    for board, type, rotation, x, y in states:
+        search_placements(board, type, [(rotation, x, y)], lambda *state: False)
+    full_search = (time.perf_counter() - start_time) / len(states)
+    print('placements: %.1f per piece in %.0f us (search of all the states %.0f us)'
+          % (n / len(states), elapsed * 1e6, full_search * 1e6))
+
+
+def _main():
+    """
+    Check the vectorized board operations against their references and
+    measure the simulation speed.
+    """
+    _check_clear_2048()
+    _check_column_heights()
+    _check_bitboard()
+    _check_hash()
+    _check_piece_generator()
+    _check_placements()
+    _benchmark_delete_floating()
+    _benchmark_bitboard()
+    _benchmark_placements()
+    _benchmark()
+
+
+if __name__ == '__main__':
+    _main()
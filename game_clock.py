@@ -0,0 +1,88 @@
+import stddraw  # used for waiting while the events of the window are handled
+from time import perf_counter  # used for measuring the elapsed time
+
+
+# Class used for running the game logic in ticks of a fixed duration that are
+# independent of the frames displayed, and for pacing the frames (in the same
+# way as pygame.time.Clock) so that the game speed does not depend on how long
+# it takes to display a frame
+class GameClock:
+    # Constructor that creates a clock with the given number of logic ticks per
+    # second, the given number of frames per second and the frame budget, that
+    # is the maximum number of logic ticks that are run before a frame
+    def __init__(self, tick_rate=60, frame_rate=60, max_ticks_per_frame=5):
+        self.tick_rate = tick_rate
+        self.frame_rate = frame_rate
+        self.max_ticks_per_frame = max_ticks_per_frame
+        # duration of a logic tick in seconds
+        self.tick_duration = 1 / tick_rate
+        # the elapsed time that is not yet run as logic ticks
+        self.accumulator = 0.0
+        # the time when the ticks were last counted and the time when the last
+        # frame has started (None until the clock is first used)
+        self.last_time = None
+        self.frame_start = None
+
+    # Method that returns the number of the logic ticks to run before the next
+    # frame for the time elapsed since it was last called
+    def ticks(self):
+        now = perf_counter()
+        if self.last_time is not None:
+            self.accumulator += now - self.last_time
+        self.last_time = now
+        n_ticks = int(self.accumulator / self.tick_duration)
+        if n_ticks > self.max_ticks_per_frame:
+            # the ticks over the frame budget are dropped, so the game slows
+            # down under a heavy load instead of freezing to catch up
+            self.accumulator = 0.0
+            return self.max_ticks_per_frame
+        self.accumulator -= n_ticks * self.tick_duration
+        return n_ticks
+
+    # Method for waiting until the next frame is due
+    def wait_frame(self):
+        now = perf_counter()
+        if self.frame_start is None:
+            self.frame_start = now
+        next_frame_start = self.frame_start + 1 / self.frame_rate
+        if now < next_frame_start:
+            stddraw.wait((next_frame_start - now) * 1000)
+            self.frame_start = next_frame_start
+        else:
+            # a late frame does not make the next frames come sooner
+            self.frame_start = now
+
+    # Method for restarting the clock (e.g. after the game is paused) so that
+    # the time passed in the meantime is not run as logic ticks
+    def reset(self):
+        self.accumulator = 0.0
+        self.last_time = None
+        self.frame_start = None
+
+
+#-----------------------------------------------------------------------
+
+def _check_pacing(seconds=2.0):
+    """
+    Run a loop whose frames take a random amount of work for the given
+    number of seconds, and print how many logic ticks and frames are run
+    compared to the tick rate and the frame rate of the clock.
+    """
+    import random
+    import time
+    clock = GameClock(tick_rate=60, frame_rate=30, max_ticks_per_frame=5)
+    n_ticks, n_frames = 0, 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        n_ticks += clock.ticks()
+        # the work done for displaying a frame
+        time.sleep(random.uniform(0, 0.02))
+        clock.wait_frame()
+        n_frames += 1
+    elapsed = time.perf_counter() - start
+    print('ticks: %.1f per second (%d), frames: %.1f per second (%d)' %
+          (n_ticks / elapsed, clock.tick_rate, n_frames / elapsed, clock.frame_rate))
+
+
+if __name__ == '__main__':
+    _check_pacing()
@@ -1,22 +1,22 @@
 import stddraw  # the stddraw module is used as a basic graphics library
 from color import Color  # used for coloring the game grid
+from tile import Tile  # used for drawing the tiles placed on the game grid
+from engine import Board  # the game logic of the grid without any drawing
+from animation import Animation  # used for showing the clear and merge effects
 import numpy as np  # fundamental Python module for scientific computing
-import copy as cp
 
 
 # Class used for modelling the game grid
-class GameGrid:
+class GameGrid(Board):
     # Constructor for creating the game grid based on the given arguments
-    def __init__(self, grid_h, grid_w):
-        # set the dimensions of the game grid as the given arguments
-        self.grid_height = grid_h
-        self.grid_width = grid_w
-        # create the tile matrix to store the tiles placed on the game grid
-        self.tile_matrix = np.full((grid_h, grid_w), None)
+    def __init__(self, grid_h, grid_w, use_bitboard=False):
+        # set the dimensions of the game grid, the value matrix that stores the
+        # log2 of the numbers of the placed tiles (0 for the empty cells), the
+        # optional bitboard of the occupied cells and the game_over flag
+        # (whether the game is over/completed or not)
+        super().__init__(grid_h, grid_w, use_bitboard)
         # the tetromino that is currently being moved on the game grid
         self.current_tetromino = None
-        # game_over flag shows whether the game is over/completed or not
-        self.game_over = False
         # set the color used for the empty grid cells
         # self.empty_cell_color = Color(203, 194, 179)
         self.empty_cell_color = Color(213, 204, 199)
@@ -26,45 +26,129 @@ class GameGrid:
         # thickness values used for the grid lines and the grid boundaries
         self.line_thickness = 0.006
         self.box_thickness = 2 * self.line_thickness
-        self.ghost_tetromino = None
+        # the static background (the empty cells, the grid lines and the side
+        # panel) drawn off-screen and the canvas scale that it is drawn for
+        # (it is drawn again only when the canvas size or scale changes)
+        self.background, self.background_scale = None, None
+        # what is shown on the last frame displayed (the drawn value matrix, the
+        # tiles of the current tetromino with the drop distance of its ghost
+        # and the score) for finding the changed regions of the next frame, or
+        # None when the whole canvas must be shown again
+        self.last_frame = None
+        # the effects of clearing the rows and merging the tiles that are shown
+        # in place of the game grid while the game goes on
+        self.animation = Animation()
         self.scr = 0
 
     # Method used for displaying the game grid
     def display(self, SCORE, game_over=False, paused=False, draw_current=True):
         self.scr = SCORE
-        # clear the background canvas to empty_cell_color
-        stddraw.clear(self.empty_cell_color)
-        # draw the game grid
-        self.draw_grid()
-        if draw_current:
-            # Draw the ghost guide
-            if self.ghost_tetromino is not None:
-                self.ghost_tetromino.draw(True)
+        # the step of the clear and merge effects to show in place of the game
+        # grid (if there is any)
+        step = self.animation.current_step()
+        if step is None:
+            value_matrix, cleared_cells = self.value_matrix, ()
+        else:
+            duration, value_matrix, cleared_cells = step
+        # draw the static background of the game grid and the side panel
+        stddraw.sprite(self.get_background())
+        # draw the game grid (or the value matrix of the effect in place of it)
+        self.draw_grid(value_matrix)
+        cleared_sprite = Tile.get_sprite(2, is_cleared=True)
+        for row, col in cleared_cells:
+            stddraw.sprite(cleared_sprite, col, row)
+        current_tiles, drop_distance = (), 0
+        if draw_current and self.current_tetromino is not None:
+            # Draw the ghost guide (the current tetromino where it would land)
+            drop_distance = self.current_tetromino.get_drop_distance(self)
+            self.current_tetromino.draw(True, -drop_distance)
             # draw the current (active) tetromino
-            if self.current_tetromino is not None:
-                self.current_tetromino.draw()
+            self.current_tetromino.draw()
+            current_tiles = tuple((tile.position.x, tile.position.y, tile.number)
+                                  for tile in self.current_tetromino.tiles)
         # draw a box around the game grid
         self.draw_boundaries()
-        # show the resulting drawing with a pause duration = 250 ms
-
+        # draw the score of the game on the side panel
         self.score(SCORE)
-        self.next_piece_box()
         # if game over, print game over screen
         if game_over:
             self.game_over_screen()
         if paused:
             self.paused()
-        stddraw.show(16.7)
-
-    # Method for drawing the cells and the lines of the grid
-    def draw_grid(self):
-        # draw each cell of the game grid
-        for row in range(self.grid_height):
-            for col in range(self.grid_width):
-                # draw the tile if the grid cell is occupied by a tile
-                if self.tile_matrix[row][col] is not None:
-                    self.tile_matrix[row][col].draw()
-                    # draw the inner lines of the grid
+        # show only the regions that have changed since the last frame (the
+        # whole canvas is shown again when a screen is drawn over the grid)
+        frame = (value_matrix.copy(), cleared_cells,
+                 (current_tiles, drop_distance), SCORE)
+        if game_over or paused:
+            dirty, self.last_frame = None, None
+        else:
+            dirty, self.last_frame = self.dirty_regions(frame), frame
+        # (the frames are paced by the game loop, so there is no pause here)
+        stddraw.show(0, dirty)
+
+    # Method that returns the regions of the canvas that differ between the
+    # last displayed frame and the given frame (None if all of it may differ)
+    def dirty_regions(self, frame):
+        if self.last_frame is None:
+            return None
+        last_value_matrix, last_cleared, last_current, last_score = self.last_frame
+        value_matrix, cleared, current, score = frame
+        # the grid cells of the tiles that are placed, merged or cleared
+        rows, cols = np.nonzero(value_matrix != last_value_matrix)
+        cells = set(zip(cols.tolist(), rows.tolist()))
+        # the cells on which the tiles are shown as cleared by the effects
+        cells.update((col, row) for row, col in set(last_cleared) ^ set(cleared))
+        # the old and the new cells of the current tetromino and its ghost
+        if current != last_current:
+            for tiles, drop_distance in (last_current, current):
+                for x, y, number in tiles:
+                    cells.add((x, y))
+                    cells.add((x, y - drop_distance))
+        # (the sprites of the cleared tiles are slightly larger than the cells)
+        regions = [(x - 0.55, y - 0.55, 1.1, 1.1) for x, y in cells]
+        # the row of the side panel on which the score is written
+        if score != last_score:
+            x_max = stddraw.canvasScale()[3]
+            regions.append((self.grid_width - 0.5, self.grid_height - 2.5,
+                            x_max - self.grid_width + 0.5, 1))
+        return regions
+
+    # Method that returns the static background, drawing it off-screen only
+    # when it is called for the first time for a canvas size and scale
+    def get_background(self):
+        scale = stddraw.canvasScale()
+        if self.background is None or self.background_scale != scale:
+            stddraw.beginSprite(opaque=True)
+            self.draw_background()
+            self.background = stddraw.endSprite()
+            self.background_scale = scale
+        return self.background
+
+    # Method for drawing the parts of the game screen that do not change
+    def draw_background(self):
+        # clear the background canvas to empty_cell_color
+        stddraw.clear(self.empty_cell_color)
+        # draw the inner lines of the grid (the box around the game grid is
+        # drawn on each frame as it overlaps the tiles next to it)
+        self.draw_lines()
+        # draw the label of the score and the boxes on the side panel
+        self.score_label()
+        self.next_piece_box()
+
+    # Method for drawing the tiles placed on the cells of the grid
+    def draw_grid(self, value_matrix=None):
+        if value_matrix is None:
+            value_matrix = self.value_matrix
+        # draw the tiles on the occupied grid cells as a single batch of the
+        # pre-drawn sprites of their numbers
+        sprites = Tile.get_sprites()
+        rows, cols = np.nonzero(value_matrix)
+        exponents = value_matrix[rows, cols].tolist()
+        stddraw.sprites([(sprites[exponent], col, row) for exponent, col, row
+                         in zip(exponents, cols.tolist(), rows.tolist())])
+
+    # Method for drawing the inner lines of the grid
+    def draw_lines(self):
         stddraw.setPenColor(self.line_color)
         stddraw.setPenRadius(self.line_thickness)
         # x and y ranges for the game grid
@@ -88,24 +172,6 @@ class GameGrid:
         stddraw.rectangle(pos_x, pos_y, self.grid_width, self.grid_height)
         stddraw.setPenRadius()  # reset the pen radius to its default value
 
-    # Method used for checking whether the grid cell with given row and column
-    # indexes is occupied by a tile or empty
-    def is_occupied(self, row, col):
-        # return False if the cell is out of the grid
-        if not self.is_inside(row, col):
-            return False
-        # the cell is occupied by a tile if it is not None
-        return self.tile_matrix[row][col] is not None
-
-    # Method used for checking whether the cell with given row and column indexes
-    # is inside the game grid or not
-    def is_inside(self, row, col):
-        if row < 0 or row >= self.grid_height:
-            return False
-        if col < 0 or col >= self.grid_width:
-            return False
-        return True
-
     # Method for updating the game grid by placing the given tiles of a stopped
     # tetromino and checking if the game is over due to having tiles above the
     # topmost game grid row. The method returns True when the game is over and
@@ -117,9 +183,11 @@ class GameGrid:
             for row in range(n_rows):
                 # place each occupied tile onto the game grid
                 if tiles_to_place[row][col] is not None:
-                    pos = tiles_to_place[row][col].get_position()
+                    pos = tiles_to_place[row][col].peek_position()
                     if self.is_inside(pos.y, pos.x):
-                        self.tile_matrix[pos.y][pos.x] = tiles_to_place[row][col]
+                        # only the log2 of the number is stored on the grid
+                        number = tiles_to_place[row][col].get_number()
+                        self.place_tile(pos.y, pos.x, number.bit_length() - 1)
                     # the game is over if any placed tile is out of the game grid
                     else:
                         self.game_over = True
@@ -127,176 +195,94 @@ class GameGrid:
         return self.game_over
 
     # Looks at the grid and clears full lines, then updates the places of upper tiles.
-    def clear(self, row, col):
-        number_of_pushes = 0
-        has_clearing_started = False  # If there is a full line this frame, then the clearing process is started.
-        tile_matrix_before_clear = cp.deepcopy(self.tile_matrix)
-        rows_to_clear = []
-        # Going through the rows from bottom to top.
-        for y in range(col):
-            is_full = False
-            tile_counter = 0
-            # Count the number of tiles in the line
-            for x in range(row):  # Going through each tile from left to right
-                if self.tile_matrix[y][x] is not None:
-                    tile_counter += 1
-            # If it is equal to row count then the line is full
-            if tile_counter == row:
-                is_full = True
-                has_clearing_started = True
-            if has_clearing_started:
-                if is_full:
-                    number_of_pushes += 1
-                    rows_to_clear.append(y)
-                    for x in range(row):  # Going through each tile from left to right
-                        self.tile_matrix[y][x] = None
-                else:
-                    for x in range(row):  # Going through each tile from left to right
-                        # Updating both the positions and the tile arrays
-                        if self.tile_matrix[y][x] is not None:
-                            self.tile_matrix[y][x].position.y -= number_of_pushes
-                            self.tile_matrix[y - number_of_pushes][x] = self.tile_matrix[y][x]
-                            self.tile_matrix[y][x] = None
-        if number_of_pushes > 0:
-            self.clear_effect(tile_matrix_before_clear, rows_to_clear)
+    def clear(self):
+        rows_to_clear = np.flatnonzero(self.value_matrix.all(axis=1))
+        if len(rows_to_clear) == 0:
+            return 0
+        value_matrix_before_clear = self.value_matrix.copy()
         # Return the number of pushes, which is equal to the number of lines cleared at the end of the process
+        number_of_pushes = Board.clear(self)
+        self.clear_effect(value_matrix_before_clear, rows_to_clear)
         return number_of_pushes
 
-    def clear_2048(self, row, col):
-        counter = 0
-        for y in range(col - 1):
-            for x in range(row):
-                if self.tile_matrix[y][x] != None and self.tile_matrix[y + 1][x] != None:
-                    if self.tile_matrix[y][x].get_number() == self.tile_matrix[y + 1][x].get_number():
-                        tile_matrix_before_clear = cp.deepcopy(self.tile_matrix)
-                        self.tile_matrix[y + 1][x] = None
-                        self.tile_matrix[y][x].set_number(self.tile_matrix[y][x].get_number() << 1)
-                        counter += self.tile_matrix[y][x].get_number()
-                        for i in range(y + 2, col - 1):
-                            if self.tile_matrix[i][x] != None:
-                                self.tile_matrix[i][x].move(0, -1)
-                                self.tile_matrix[i - 1][x] = self.tile_matrix[i][x]
-                                self.tile_matrix[i][x] = None
-                        self.clear_2048_effect(tile_matrix_before_clear, x, y)
-                        counter += self.clear_2048(row, col)
-                        return counter
-        return 0
-
-    def clear_2048_effect(self, tile_matrix_before_clear, x, y):
-        tile_matrix_before_clear[y][x].draw(is_cleared=True)
-        tile_matrix_before_clear[y + 1][x].draw(is_cleared=True)
-        stddraw.show(125)
-        self.display(self.scr, draw_current=False)
-        stddraw.show(125)
+    # Merges the tiles as in 2048 (all columns at once) and shows each merge
+    def clear_2048(self):
+        value_matrix_before_clear = self.value_matrix.copy()
+        counter = Board.clear_2048(self)
+        if self.merges:
+            self.clear_2048_effect(value_matrix_before_clear, self.merges)
+        return counter
+
+    # Queues the merges to be shown one by one in the order they are done by
+    # clear_2048
+    def clear_2048_effect(self, value_matrix_before_clear, merges):
+        # the merges are applied again one at a time to queue each step
+        step_board = Board(self.grid_height, self.grid_width)
+        step_board.value_matrix = value_matrix_before_clear.copy()
+        for y, x in merges:
+            self.animation.add(125, step_board.value_matrix.copy(),
+                               [(y, x), (y + 1, x)])
+            step_board.merge_pair(y, x)
+            self.animation.add(125, step_board.value_matrix.copy())
 
     # If there is a tile that doesn't have any 4-connected neighbours, delete the tile
     def delete_alone(self, row, col):
         to_add = 0
         for y in range(col - 1):
             for x in range(row):
-                if self.tile_matrix[y][x] != None:
+                if self.value_matrix[y][x] != 0:
                     if y > 0:  # if the tile doesn't touch the bottommost place
                         if x == 11:  # if the tile is at the righmost place, don't look for the right neighbour
-                            if self.tile_matrix[y + 1][x] == None and self.tile_matrix[y - 1][x] == None and \
-                                    self.tile_matrix[y][x - 1] == None:
-                                to_add += int(self.tile_matrix[y][x].get_number())
-                                self.tile_matrix[y][x] = None
+                            if self.value_matrix[y + 1][x] == 0 and self.value_matrix[y - 1][x] == 0 and \
+                                    self.value_matrix[y][x - 1] == 0:
+                                to_add += 1 << int(self.value_matrix[y][x])
+                                self.value_matrix[y][x] = 0
                         elif x == 0:  # if the tile is at the leftmost place, don't look dot the left neighnour
-                            if self.tile_matrix[y + 1][x] == None and self.tile_matrix[y - 1][x] == None and \
-                                    self.tile_matrix[y][x + 1] == None:
-                                to_add += int(self.tile_matrix[y][x].get_number())
-                                self.tile_matrix[y][x] = None
+                            if self.value_matrix[y + 1][x] == 0 and self.value_matrix[y - 1][x] == 0 and \
+                                    self.value_matrix[y][x + 1] == 0:
+                                to_add += 1 << int(self.value_matrix[y][x])
+                                self.value_matrix[y][x] = 0
                         # belki lazım olur
                         elif y == 19:
-                            if self.tile_matrix[y - 1][x] == None and self.tile_matrix[y][x + 1] == None and \
-                                    self.tile_matrix[y][x - 1] == None:
-                                to_add += int(self.tile_matrix[y][x].get_number())
-                                self.tile_matrix[y][x] = None
+                            if self.value_matrix[y - 1][x] == 0 and self.value_matrix[y][x + 1] == 0 and \
+                                    self.value_matrix[y][x - 1] == 0:
+                                to_add += 1 << int(self.value_matrix[y][x])
+                                self.value_matrix[y][x] = 0
 
                         else:  # if the tile is not at the rightmost or leftmost place, look for, up, down, lef and right neighbours
-                            if self.tile_matrix[y + 1][x] == None and self.tile_matrix[y - 1][x] == None and \
-                                    self.tile_matrix[y][x + 1] == None and self.tile_matrix[y][x - 1] == None:
-                                to_add += int(self.tile_matrix[y][x].get_number())
-                                self.tile_matrix[y][x] = None
-        return to_add
-
-    def delete_floating(self):
-        labels = np.full((self.grid_height, self.grid_width), 0)
-        to_add = 0
-
-        for y in range(self.grid_height):
-            for x in range(self.grid_width):
-                if self.tile_matrix[y][x] is not None:
-                    not_connected = True
-                    if y < self.grid_height:
-                        if y == 0:
-                            labels[y][x] = 1
-                            if self.tile_matrix[y + 1][x] is not None:
-                                labels[y + 1][x] = 1
-                            not_connected = False
-                        elif labels[y][x] != 1:
-                            if x != 0:
-                                if self.tile_matrix[y][x - 1] is not None:
-                                    if labels[y][x - 1] == 1:
-                                        labels[y][x] = 1
-                                        if self.tile_matrix[y + 1][x] is not None:
-                                            labels[y + 1][x] = 1
-                                        not_connected = False
-                            for i in range(x, self.grid_width - 1):
-                                if self.tile_matrix[y][i] is not None:
-                                    if labels[y][i] == 1:
-                                        labels[y][x] = 1
-                                        if self.tile_matrix[y + 1][x] is not None:
-                                            labels[y + 1][x] = 1
-                                        not_connected = False
-                                    else:
-                                        continue
-                                break
-                        else:
-                            not_connected = False
-                            if self.tile_matrix[y + 1][x] is not None:
-                                labels[y + 1][x] = 1
-                    if not_connected:
-                        labels[y][x] = 2
-
-        for y in reversed(range(1, self.grid_height)):
-            for x in reversed(range(self.grid_width)):
-                if self.tile_matrix[y][x] is not None:
-                    if labels[y][x] == 1:
-                        if self.tile_matrix[y - 1][x] is not None:
-                            labels[y - 1][x] = 1
-
-        for y in range(self.grid_height):
-            for x in range(self.grid_width):
-                if self.tile_matrix[y][x] is not None:
-                    if labels[y][x] == 2:
-                        to_add += int(self.tile_matrix[y][x].get_number())
-                        self.tile_matrix[y][x] = None
+                            if self.value_matrix[y + 1][x] == 0 and self.value_matrix[y - 1][x] == 0 and \
+                                    self.value_matrix[y][x + 1] == 0 and self.value_matrix[y][x - 1] == 0:
+                                to_add += 1 << int(self.value_matrix[y][x])
+                                self.value_matrix[y][x] = 0
         return to_add
 
     def clear_everything(self, row, col):
-        for y in range(col):
-            for x in range(row):
-                self.tile_matrix[y][x] = None
+        self.animation.skip()
+        self.value_matrix[:col, :row] = 0
+        self.update_heights()
+        self.update_bitboard()
+        self.update_hash()
 
-    def score(self, SCORE):
+    def score_label(self):
         text_color = Color(0, 0, 0)
         stddraw.setFontFamily("Arial")
         stddraw.setFontSize(25)
         stddraw.setPenColor(text_color)
         text_to_display = "Score"
         stddraw.text(self.grid_width + 1.15, self.grid_height - 1.1, text_to_display)
+
+    def score(self, SCORE):
+        text_color = Color(0, 0, 0)
+        stddraw.setFontFamily("Arial")
+        stddraw.setFontSize(25)
+        stddraw.setPenColor(text_color)
         text_to_score = str(SCORE).rjust(8)
         stddraw.text(self.grid_width + 0.92, self.grid_height - 2, text_to_score)
 
-    def clear_effect(self, tile_matrix_before_clear, rows_to_clear):
-        for y in range(self.grid_height):
-            for x in range(self.grid_width):
-                if tile_matrix_before_clear[y][x] is not None:
-                    tile_matrix_before_clear[y][x].draw()
-                    if y in rows_to_clear:
-                        tile_matrix_before_clear[y][x].draw(is_cleared=True)
-        stddraw.show(250)
+    def clear_effect(self, value_matrix_before_clear, rows_to_clear):
+        cleared_cells = [(y, x) for y in rows_to_clear for x in range(self.grid_width)
+                         if value_matrix_before_clear[y][x] != 0]
+        self.animation.add(250, value_matrix_before_clear, cleared_cells)
 
     # game over splash screen
     def game_over_screen(self):
@@ -345,3 +331,178 @@ class GameGrid:
         stddraw.filledRectangle(self.grid_width / 2 - 2.5, self.grid_height / 2 - 0.8, 5, 1.7)
         stddraw.setPenColor(text_color)
         stddraw.boldText(self.grid_width / 2, self.grid_height / 2, text_to_display)
+
+#-----------------------------------------------------------------------
+
+def _count_allocations(frames=60):
+    """
+    Display the given number of frames of a game in which the current
+    tetromino moves every frame, and print how many Tile, Point and Color
+    objects are created and how many deep copies are made per frame,
+    together with the counts of the same run before the tiles used
+    __slots__ and shared colors and before get_position returned its
+    point without a deep copy (measured on the commit before that change
+    with the same grid and moves).
+    """
+    import copy
+    import point
+    import tile
+    import color
+    from tetromino import Tetromino
+    grid_h, grid_w = 20, 12
+    grid = GameGrid(grid_h, grid_w)
+    # a half full grid with all tile numbers from 2 to 2048
+    for row in range(grid_h // 2):
+        for col in range(grid_w - 1):
+            grid.value_matrix[row][col] = 1 + (row + col) % 11
+    grid.update_heights()
+    counts = {}
+
+    # count the calls of the given function of the given object
+    def count_calls(owner, name):
+        function = getattr(owner, name)
+        key = owner.__name__ + '.' + name
+
+        def counted(*args, **kwargs):
+            counts[key] = counts.get(key, 0) + 1
+            return function(*args, **kwargs)
+        setattr(owner, name, counted)
+        return function
+
+    functions_to_count = [(point.Point, '__init__'), (tile.Tile, '__init__'),
+                          (color.Color, '__init__'), (copy, 'deepcopy')]
+    originals = [(owner, name, count_calls(owner, name))
+                 for owner, name in functions_to_count]
+    try:
+        for frame in range(frames):
+            if frame % grid_h == 0:
+                tetromino = Tetromino('T', grid_h, grid_w, grid_w // 2 - 1)
+                grid.current_tetromino = tetromino
+            tetromino.move(('left', 'right', 'down')[frame % 3], grid)
+            grid.display(0)
+    finally:
+        for owner, name, function in originals:
+            setattr(owner, name, function)
+    total = sum(counts.values())
+    print('per frame: %.1f allocations (%s)' % (total / frames, ', '.join(
+        '%s %.1f' % (name, count / frames) for name, count in sorted(counts.items()))))
+    print('per frame before: 815.0 allocations (Color.__init__ 476.3, '
+          'Point.__init__ 220.4, Tile.__init__ 110.2, copy.deepcopy 8.0)')
+
+
+def _benchmark_draw_grid(frames=200):
+    """
+    Print the time it takes to draw a full game grid by drawing the shape
+    of each tile and by using the sprite atlas of the tiles.
+    """
+    import time
+    grid_h, grid_w = 20, 12
+    grid = GameGrid(grid_h, grid_w)
+    for row in range(grid_h):
+        for col in range(grid_w):
+            grid.value_matrix[row][col] = 1 + (row + col) % 17
+    start = time.perf_counter()
+    for frame in range(frames):
+        for row in range(grid_h):
+            for col in range(grid_w):
+                Tile.draw_shape(1 << int(grid.value_matrix[row][col]), col, row)
+    shapes = (time.perf_counter() - start) / frames
+    Tile.get_sprites()
+    start = time.perf_counter()
+    for frame in range(frames):
+        grid.draw_grid()
+    sprites = (time.perf_counter() - start) / frames
+    print('draw_grid: %.2f ms with shapes, %.2f ms with sprites' %
+          (shapes * 1000, sprites * 1000))
+
+
+def _check_dirty_regions(frames=300):
+    """
+    Display the given number of frames of a game played with random moves,
+    showing only the changed regions of each frame, and check that the
+    window canvas is the same as the background canvas after each frame.
+    """
+    import random
+    import pygame
+    from tetromino import Tetromino
+    from engine import PieceGenerator
+    grid_h, grid_w = 20, 12
+    grid = GameGrid(grid_h, grid_w)
+    random.seed(1)
+    generator = PieceGenerator(1, grid_w)
+    tetromino, score = None, 0
+    for frame in range(frames):
+        if tetromino is None:
+            type, x, exponents = generator.next_piece()
+            tetromino = Tetromino(type, grid_h, grid_w, x)
+            tetromino.set_tile_numbers(exponents)
+            grid.current_tetromino = tetromino
+        direction = random.choice(('left', 'right', 'down', 'down', 'up'))
+        if direction == 'up':
+            tetromino.rotate(grid)
+        elif not tetromino.move(direction, grid) and direction == 'down':
+            # lock the tetromino (the effects are shown on the next frames)
+            if grid.update_grid(tetromino.tile_matrix):
+                grid.clear_everything(grid_w, grid_h)
+            score += grid.clear_2048()
+            score += grid.clear() * 100
+            score += grid.delete_floating()
+            tetromino = None
+            grid.current_tetromino = None
+        grid.display(score)
+        # violates encapsulation to compare the canvases
+        window = pygame.surfarray.array3d(pygame.display.get_surface())
+        canvas = pygame.surfarray.array3d(stddraw._surface)
+        assert (window == canvas).all(), 'frame %d differs' % frame
+    print('dirty regions: %d frames shown correctly' % frames)
+
+def _check_hash(pieces=500):
+    """
+    Drop tetrominoes with random numbers at random positions on a game
+    grid (without displaying it) and check after each lock that the
+    incrementally updated hash is equal to the one computed from scratch.
+    """
+    import random
+    from tetromino import Tetromino
+    from engine import PieceGenerator
+    grid_h, grid_w = 20, 12
+    grid = GameGrid(grid_h, grid_w)
+    random.seed(2)
+    generator = PieceGenerator(2, grid_w)
+    for piece in range(pieces):
+        type, x, exponents = generator.next_piece()
+        tetromino = Tetromino(type, grid_h, grid_w, x)
+        tetromino.set_tile_numbers(exponents)
+        for i in range(random.randint(0, 3)):
+            tetromino.rotate(grid)
+        tetromino.hard_drop(grid)
+        if grid.update_grid(tetromino.tile_matrix):
+            grid.clear_everything(grid_w, grid_h)
+        while True:
+            merged = grid.clear_2048()
+            cleared = grid.clear()
+            grid.delete_floating()
+            if merged + cleared == 0:
+                break
+        assert grid.check_hash(), piece
+    grid.animation.skip()
+    print('hash: %d tetrominoes placed with the hash in sync' % pieces)
+
+
+def _main():
+    """
+    Set the canvas up as in the game, and run the checks and the
+    benchmarks above.
+    """
+    grid_h, grid_w = 20, 12
+    stddraw.setCanvasSize(40 * (grid_w + 3), 40 * grid_h)
+    stddraw.setXscale(-0.5, grid_w + 2.5)
+    stddraw.setYscale(-0.5, grid_h - 0.5)
+    _count_allocations()
+    _benchmark_draw_grid()
+    _check_dirty_regions()
+    _check_hash()
+
+
+if __name__ == '__main__':
+    _main()
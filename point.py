@@ -1,5 +1,8 @@
 # A class for representing a point as a location in 2D space
 class Point:
+    # only the coordinates are stored in each Point object
+    __slots__ = ('x', 'y')
+
     # constructor that creates a point at the given (x, y) location
     # default values for the given location are set as x = 0 and y = 0
     def __init__(self, x=0, y=0):
@@ -0,0 +1,415 @@
+import struct  # used for packing the header of the replay files
+import time  # used for playing the replays back at the speed of the game
+import zlib  # used for compressing the keyframes of the replay files
+from bisect import bisect_left, bisect_right  # used for seeking in the replays
+import numpy as np  # used for the value matrix of the keyframes
+from engine import TickEngine, Piece, TYPES  # used for playing the replays back without drawing
+
+# The replay module records a game as its seed and the keys typed at each tick
+# of the game loop, and plays the recorded games back on the engine.
+
+# keys of the game that are recorded (each is stored as its index in the list)
+KEYS = ['left', 'right', 'down', 'space', 'up', 'p', 'r', 'i', 'b', 'n', 'y']
+# header of the replay files: the magic bytes, the version, the grid height and
+# width, the ticks per second, the game speed in ms, the seed, the number of
+# ticks that the game has run and the number of the recorded keys
+MAGIC = b'T2RP'
+VERSION = 2
+HEADER = struct.Struct('<4sBBBHHQII')
+# the events are followed (since version 2) by the number of the locks between
+# the keyframes, the number of the keyframes and the length of the compressed
+# keyframes
+KEYFRAMES_HEADER = struct.Struct('<HII')
+# a keyframe is the state of the game after a tick: the tick, the position of
+# the piece generator, the number of the pieces placed, the score counters, the
+# time passed since the piece last moved down, whether the piece could move down
+# the last time, the debug modes, the type, rotation, position and exponents of
+# the current piece and the type, position and exponents of the next piece
+# (padded with zeros, e.g. for a piece whose tiles are removed by a restart),
+# followed by the value matrix of the board
+KEYFRAME = struct.Struct('<IIIIIIdBBBBBhh4BBh4B')
+# number of the locks between the keyframes of the saved replays
+KEYFRAME_INTERVAL = 50
+
+
+# Class used for representing a recorded game: the settings of the game, the
+# seed of its pieces and the (tick, key) events, where tick is the number of the
+# ticks run when the key is typed (the key is applied on that tick, or after it
+# for the y typed on the game over screen)
+class Replay:
+    # Constructor that creates a replay with no events for a game with the
+    # given seed and settings
+    def __init__(self, seed, grid_h=20, grid_w=12, tick_rate=60, game_speed=0.5):
+        self.seed = seed
+        self.grid_height = grid_h
+        self.grid_width = grid_w
+        self.tick_rate = tick_rate
+        self.game_speed = game_speed
+        self.events = []
+        # the number of the ticks that the recorded game has run
+        self.ticks = 0
+        # the keyframes for seeking in the replay (the state of the game every
+        # keyframe_interval locks) as (tick, packed keyframe) in tick order
+        self.keyframes = []
+        self.keyframe_interval = KEYFRAME_INTERVAL
+
+    # Method for recording the given key typed on the given tick (the keys that
+    # do not change the game are not recorded)
+    def add(self, tick, key):
+        if key in KEYS:
+            self.events.append((tick, key))
+        self.ticks = max(self.ticks, tick)
+
+    # Method that returns the replay as bytes: the header and then each event
+    # as a variable length integer (7 bits per byte) of the ticks passed since
+    # the previous event shifted left by 4 bits plus the index of the key
+    def to_bytes(self):
+        data = bytearray(HEADER.pack(
+            MAGIC, VERSION, self.grid_height, self.grid_width, self.tick_rate,
+            int(round(self.game_speed * 1000)), self.seed, self.ticks,
+            len(self.events)))
+        last_tick = 0
+        for tick, key in self.events:
+            value = (tick - last_tick) << 4 | KEYS.index(key)
+            last_tick = tick
+            while value >= 0x80:
+                data.append(value & 0x7F | 0x80)
+                value >>= 7
+            data.append(value)
+        keyframes = zlib.compress(b''.join(keyframe for tick, keyframe in self.keyframes))
+        data += KEYFRAMES_HEADER.pack(self.keyframe_interval, len(self.keyframes),
+                                      len(keyframes))
+        data += keyframes
+        return bytes(data)
+
+    # Method for saving the replay to the file with the given path (with the
+    # keyframes of the events recorded so far)
+    def save(self, path):
+        self.index()
+        with open(path, 'wb') as file:
+            file.write(self.to_bytes())
+
+    # Method for creating the keyframes of the replay by playing it back, with
+    # a keyframe after every interval locks
+    def index(self, interval=KEYFRAME_INTERVAL):
+        self.keyframe_interval = interval
+        self.keyframes = []
+
+        def add_keyframe(engine):
+            # (there are no keyframes on the game over screen)
+            if engine.pieces_placed >= (len(self.keyframes) + 1) * interval and \
+                    not engine.game_over:
+                self.keyframes.append((engine.ticks, pack_keyframe(engine)))
+
+        self.play(on_tick=add_keyframe)
+
+    # Method that returns a TickEngine with the state of the game after the
+    # given tick, which is played back from the last keyframe before it
+    def seek(self, tick):
+        ticks = [keyframe_tick for keyframe_tick, keyframe in self.keyframes]
+        i = bisect_right(ticks, tick)
+        if i == 0:
+            engine = self.new_engine()
+        else:
+            engine = unpack_keyframe(self.keyframes[i - 1][1], self.new_engine())
+        return self.run(engine, until=tick)
+
+    # Method that returns a TickEngine for a new game with the settings of the
+    # replay
+    def new_engine(self):
+        return TickEngine(self.grid_height, self.grid_width, self.seed,
+                          self.tick_rate, self.game_speed)
+
+    # Method for playing the replay back on a TickEngine (from the given tick
+    # on), as fast as possible or at the speed of the game if realtime is True.
+    # The given function (if any) is called with the engine after each tick.
+    # Returns the engine.
+    def play(self, realtime=False, on_tick=None, from_tick=0):
+        engine = self.seek(from_tick) if from_tick > 0 else self.new_engine()
+        return self.run(engine, realtime=realtime, on_tick=on_tick)
+
+    # Method for running the given engine on the events of the replay from its
+    # tick until the given tick (or the end of the replay). Returns the engine.
+    def run(self, engine, until=None, realtime=False, on_tick=None):
+        end = self.ticks if until is None else until
+        start, start_tick = time.perf_counter(), engine.ticks
+        # the keys typed on the ticks run so far have been applied, while the y
+        # typed on the game over screen after the last tick has not
+        ticks = [tick for tick, key in self.events]
+        i = bisect_left(ticks, engine.ticks)
+        while i < len(self.events) and self.events[i][0] == engine.ticks and \
+                self.events[i][1] != 'y':
+            i += 1
+        event = self.events[i] if i < len(self.events) else None
+        while True:
+            # the y typed on the game over screen goes on with a new board
+            if event is not None and event[1] == 'y' and \
+                    (engine.game_over or engine.ticks >= event[0]) and \
+                    (until is None or engine.ticks < until):
+                if engine.game_over:
+                    engine.continue_game()
+                i += 1
+                event = self.events[i] if i < len(self.events) else None
+                continue
+            if engine.game_over or engine.ticks >= end:
+                break
+            key = None
+            if event is not None and event[0] == engine.ticks + 1 and \
+                    event[1] != 'y':
+                key = event[1]
+                i += 1
+                event = self.events[i] if i < len(self.events) else None
+            engine.run_tick(key)
+            if on_tick is not None:
+                on_tick(engine)
+            if realtime:
+                delay = start + (engine.ticks - start_tick) / self.tick_rate - \
+                    time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        return engine
+
+
+# Function that returns the state of the given TickEngine as a keyframe (bytes)
+def pack_keyframe(engine):
+    current, next_piece = engine.current_piece, engine.next_piece
+    padding = [0] * 4
+    return KEYFRAME.pack(
+        engine.ticks, engine.generator.position(), engine.pieces_placed,
+        engine.score, engine.cleared, engine.combined, engine.fall_time,
+        engine.success, engine.debug, engine.debug2,
+        TYPES.index(current.type), current.rotation, current.x, current.y,
+        *(current.exponents + padding)[:4], TYPES.index(next_piece.type),
+        next_piece.x, *(next_piece.exponents + padding)[:4]) + \
+        engine.board.value_matrix.tobytes()
+
+
+# Function for setting the state of the given TickEngine (created with the
+# settings of the replay) to the given keyframe. Returns the engine.
+def unpack_keyframe(data, engine):
+    values = KEYFRAME.unpack_from(data)
+    (engine.ticks, position, engine.pieces_placed, engine.score, engine.cleared,
+     engine.combined, engine.fall_time) = values[:7]
+    engine.success, engine.debug, engine.debug2 = (bool(v) for v in values[7:10])
+    engine.generator.seek(position)
+    current = Piece(TYPES[values[10]], engine.grid_height, engine.grid_width, values[12])
+    current.rotation, current.y = values[11], values[13]
+    # (the tiles have exponents of at least 1, so the zeros are the padding)
+    current.exponents = [exponent for exponent in values[14:18] if exponent]
+    next_piece = Piece(TYPES[values[18]], engine.grid_height, engine.grid_width, values[19])
+    next_piece.exponents = [exponent for exponent in values[20:24] if exponent]
+    engine.current_piece, engine.next_piece = current, next_piece
+    engine.game_over = False
+    board = engine.board
+    board.value_matrix[:, :] = np.frombuffer(
+        data, np.uint8, board.value_matrix.size, KEYFRAME.size).reshape(
+        board.value_matrix.shape)
+    board.update_heights()
+    board.update_bitboard()
+    board.update_hash()
+    return engine
+
+
+# Function that returns the replay given as bytes (by Replay.to_bytes)
+def from_bytes(data):
+    (magic, version, grid_h, grid_w, tick_rate, game_speed, seed, ticks,
+     n_events) = HEADER.unpack_from(data)
+    if magic != MAGIC or version not in (1, VERSION):
+        raise ValueError('not a replay file of a supported version')
+    replay = Replay(seed, grid_h, grid_w, tick_rate, game_speed / 1000)
+    replay.ticks = ticks
+    position, tick = HEADER.size, 0
+    for i in range(n_events):
+        value, shift = 0, 0
+        while True:
+            byte = data[position]
+            position += 1
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            if byte < 0x80:
+                break
+        tick += value >> 4
+        replay.events.append((tick, KEYS[value & 0xF]))
+    # (the replays of version 1 have no keyframes)
+    if version >= 2:
+        interval, n_keyframes, length = KEYFRAMES_HEADER.unpack_from(data, position)
+        position += KEYFRAMES_HEADER.size
+        keyframes = zlib.decompress(data[position:position + length])
+        size = len(keyframes) // max(n_keyframes, 1)
+        replay.keyframe_interval = interval
+        for i in range(n_keyframes):
+            keyframe = keyframes[i * size:(i + 1) * size]
+            replay.keyframes.append((KEYFRAME.unpack_from(keyframe)[0], keyframe))
+    return replay
+
+
+# Function that returns the replay saved to the file with the given path
+def load(path):
+    with open(path, 'rb') as file:
+        return from_bytes(file.read())
+
+
+#-----------------------------------------------------------------------
+
+def _check_round_trip(games=20):
+    """
+    Record games with random keys on random ticks, and check that each
+    replay is the same after converting it to bytes and back, and that
+    playing it back twice gives the same game.
+    """
+    import random
+    rng = random.Random(2048)
+    n_bytes, n_events = 0, 0
+    for game in range(games):
+        replay = Replay(rng.randrange(2 ** 32))
+        tick = 0
+        for i in range(rng.randint(0, 2000)):
+            tick += rng.choice((1, 1, 2, 5, 30, 300))
+            replay.add(tick, rng.choice(KEYS[:5] + ['i', 'n']))
+        data = replay.to_bytes()
+        copy = from_bytes(data)
+        assert (copy.seed, copy.ticks, copy.events) == \
+            (replay.seed, replay.ticks, replay.events)
+        first, second = replay.play(), copy.play()
+        assert (first.ticks, first.cleared, first.combined) == \
+            (second.ticks, second.cleared, second.combined)
+        assert (first.board.value_matrix == second.board.value_matrix).all()
+        n_bytes += len(data) - HEADER.size
+        n_events += len(replay.events)
+    print('replays: %d games match after a round trip, %.2f bytes per key' %
+          (games, n_bytes / max(n_events, 1)))
+
+
+def _record(ticks, seed=1):
+    """
+    Return a replay of a game of the given number of ticks in which a
+    random key is typed on every tenth tick and y is typed after each
+    game over, and the engine on which it is recorded.
+    """
+    import random
+    rng = random.Random(seed)
+    replay = Replay(seed)
+    engine = TickEngine(seed=replay.seed)
+    while engine.ticks < ticks:
+        key = rng.choice(KEYS[:5]) if engine.ticks % 10 == 9 else None
+        if key is not None:
+            replay.add(engine.ticks + 1, key)
+        if not engine.run_tick(key):
+            replay.add(engine.ticks, 'y')
+            engine.continue_game()
+    return replay, engine
+
+
+def _state(engine):
+    """
+    Return the state of the given engine that is compared by the checks.
+    """
+    return (engine.ticks, engine.score, engine.cleared, engine.combined,
+            engine.pieces_placed, engine.game_over, engine.fall_time,
+            engine.success, engine.current_piece.get_tiles(),
+            engine.next_piece.get_tiles(), engine.generator.position(),
+            engine.board.value_matrix.tobytes())
+
+
+def _check_seek(ticks=20000, seeks=200):
+    """
+    Record a game, and check that seeking to random ticks (and to the
+    ticks of the keyframes and of the game overs) gives the same state as
+    playing the replay back from the start, also after a round trip.
+    """
+    import random
+    rng = random.Random(2048)
+    replay, engine = _record(ticks)
+    replay.index(interval=10)
+    copy = from_bytes(replay.to_bytes())
+    assert copy.keyframes == replay.keyframes
+    targets = [rng.randint(0, ticks) for i in range(seeks)]
+    targets += [tick for tick, keyframe in replay.keyframes[:20]]
+    targets += [tick for tick, key in replay.events if key == 'y']
+    states = {}
+
+    def save_state(engine):
+        if engine.ticks in targets:
+            states[engine.ticks] = _state(engine)
+
+    replay.play(on_tick=save_state)
+    for tick in targets:
+        if tick > 0:
+            assert _state(copy.seek(tick)) == states[tick], tick
+    for tick in targets[:10]:
+        assert _state(copy.play(from_tick=tick)) == _state(engine)
+    print('seek: %d ticks match (%d keyframes, every %d locks)' %
+          (len(targets), len(replay.keyframes), replay.keyframe_interval))
+
+
+def _check_empty_piece(seed=20):
+    """
+    Check that a keyframe of a tick on which the tiles of the current
+    piece are removed by a restart (r typed when the piece falls) gives
+    the same state after it is unpacked.
+    """
+    engine = TickEngine(seed=seed)
+    for tick in range(100):
+        engine.run_tick()
+    engine.fall_time = 1.0
+    engine.run_tick('r')
+    assert engine.current_piece.exponents == [] and not engine.game_over
+    copy = unpack_keyframe(pack_keyframe(engine), TickEngine(seed=seed))
+    assert _state(copy) == _state(engine)
+    print('keyframes: a piece without tiles is packed and unpacked')
+
+
+def _benchmark(ticks=60 * 60 * 30):
+    """
+    Record a 30 minute game (at 60 ticks per second), and print how fast
+    it is played back, the size of its file and how long it takes to seek
+    to random ticks in it.
+    """
+    import random
+    replay, engine = _record(ticks)
+    start = time.perf_counter()
+    played = replay.play()
+    elapsed = time.perf_counter() - start
+    assert (played.ticks, played.cleared, played.combined) == \
+        (engine.ticks, engine.cleared, engine.combined)
+    print('replay: %d ticks played back in %.2f s (%.0f ticks/s)' %
+          (played.ticks, elapsed, played.ticks / elapsed))
+    replay.index()
+    data = replay.to_bytes()
+    rng = random.Random(1)
+    start = time.perf_counter()
+    for i in range(100):
+        replay.seek(rng.randint(0, ticks))
+    elapsed = time.perf_counter() - start
+    print('seek: %d bytes (%d keyframes), %.1f ms per seek' %
+          (len(data), len(replay.keyframes), elapsed * 10))
+
+
+def _main():
+    """
+    Play back the replay files given as the command line arguments (at
+    the speed of the game with --realtime, from the given tick with
+    --from=TICK), or run the checks above.
+    """
+    import sys
+    paths = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    from_tick = 0
+    for arg in sys.argv[1:]:
+        if arg.startswith('--from='):
+            from_tick = int(arg[len('--from='):])
+    if not paths:
+        _check_round_trip()
+        _check_seek()
+        _check_empty_piece()
+        _benchmark()
+        return
+    for path in paths:
+        engine = load(path).play(realtime='--realtime' in sys.argv,
+                                 from_tick=from_tick)
+        print('%s: %d ticks, %d pieces, score %d%s' % (
+            path, engine.ticks, engine.pieces_placed, engine.score,
+            ', game over' if engine.game_over else ''))
+
+
+if __name__ == '__main__':
+    _main()
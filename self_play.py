@@ -0,0 +1,205 @@
+import argparse  # used for parsing the command line arguments
+import os  # used for the number of the cores
+import random  # used by the random policy
+import time  # used for measuring how fast the games are played
+from concurrent.futures import ProcessPoolExecutor  # used for playing the games in parallel
+import numpy as np  # used for the seeds and the columns of the results
+from engine import Engine, SHAPES, random_policy  # used for playing the games without drawing
+from autoplayer import AutoPlayer  # used by the expectimax policy
+
+# The self_play module plays many headless games with a policy (random, greedy,
+# scripted or expectimax) on a pool of worker processes and writes the
+# statistics of each game as the columns of one .npz file. Run it from the
+# command line, e.g.
+#     python self_play.py --games 1000 --policy greedy --output results.npz
+# The seed of each game is derived from the seed of the run and the index of
+# the game, so the results do not depend on the number of the workers.
+
+# columns of the results (one value per game)
+COLUMNS = ['game', 'seed', 'score', 'cleared', 'combined', 'pieces_placed',
+           'max_tile']
+
+
+# Function that returns the actions that move the current piece of the engine
+# to the given horizontal position (as far as it can go)
+def moves_to(engine, x):
+    piece = engine.current_piece
+    direction = "left" if x < piece.x else "right"
+    return [direction] * abs(x - piece.x)
+
+
+# Function that returns a value for the given board after a placement: the
+# score gained minus the penalties for the holes (empty cells below the top of
+# their columns), the height of the stack and its bumpiness
+def evaluate(board, gained):
+    heights = board.column_heights
+    holes = int(heights.sum()) - np.count_nonzero(board.value_matrix)
+    bumpiness = int(np.abs(np.diff(heights)).sum())
+    return gained - 40 * holes - 5 * int(heights.max()) - 2 * bumpiness
+
+
+# Policy that tries every rotation and every horizontal position of the
+# current piece on a copy of the board and drops it where the placement has the
+# highest value (see evaluate)
+def greedy_policy(engine):
+    board = engine.board
+    best_value, best_actions = None, ["space"]
+    for rotations in range(4):
+        piece = engine.current_piece.copy()
+        actions = []
+        for i in range(rotations):
+            if piece.rotate(board):
+                actions.append("up")
+        # the unmoved position is tried once, then the positions to its left
+        # and to its right up to the walls
+        placements = [(piece, [])]
+        for direction in ("left", "right"):
+            moved, moves = piece.copy(), []
+            while moved.move(direction, board):
+                moves.append(direction)
+                placements.append((moved.copy(), list(moves)))
+        for placed, moves in placements:
+            placed.hard_drop(board)
+            copy = board.copy()
+            if copy.update_grid(placed):
+                value = -10 ** 9
+            else:
+                cleared, combined = copy.resolve()
+                value = evaluate(copy, cleared * 100 + combined)
+            if best_value is None or value > best_value:
+                best_value = value
+                best_actions = actions + moves + ["space"]
+    return best_actions
+
+
+# the autoplayer of the expectimax policy, which searches the current and the
+# next piece and the average over the pieces after them on every move instead
+# of using a time budget, so that the results do not depend on the speed of the
+# workers
+AUTOPLAYER = AutoPlayer(time_budget=None, max_depth=3)
+
+
+# Policy that drops the pieces without rotating them side by side, from the
+# left wall to the right wall of the board and then from the left wall again
+def scripted_policy(engine):
+    n = SHAPES[engine.current_piece.type][0]
+    x = (engine.pieces_placed * 3) % (engine.grid_width - n + 1)
+    return moves_to(engine, x) + ["space"]
+
+
+POLICIES = {'random': random_policy, 'greedy': greedy_policy,
+            'scripted': scripted_policy, 'expectimax': AUTOPLAYER.policy}
+
+
+# Function that returns the seed of the game with the given index in a run
+# with the given seed
+def game_seed(seed, game):
+    return int(np.random.SeedSequence(seed, spawn_key=(game,)).generate_state(
+        1, np.uint64)[0])
+
+
+# Function that plays the games with the given indexes (from start to stop) in
+# a worker process, and returns the columns of their statistics
+def play_games(policy_name, seed, start, stop, max_pieces=None, grid_h=20, grid_w=12):
+    policy = POLICIES[policy_name]
+    results = {column: np.zeros(stop - start, dtype=np.uint64 if column == 'seed'
+                                else np.int64) for column in COLUMNS}
+    for i, game in enumerate(range(start, stop)):
+        seed_of_game = game_seed(seed, game)
+        # the random policy uses the random module
+        random.seed(seed_of_game)
+        engine = Engine(grid_h, grid_w, True, seed_of_game)
+        # the largest tile on the board after each piece
+        exponents = []
+        engine.play(policy, max_pieces, on_piece=lambda engine: exponents.append(
+            int(engine.board.value_matrix.max())))
+        max_exponent = max(exponents, default=0)
+        row = (game, seed_of_game, engine.score, engine.cleared, engine.combined,
+               engine.pieces_placed, 1 << max_exponent if max_exponent else 0)
+        for column, value in zip(COLUMNS, row):
+            results[column][i] = value
+    return results
+
+
+# Function that plays the given number of games on the given number of worker
+# processes, and returns the merged columns of their statistics (in the order
+# of the games) and the elapsed time in seconds
+def run(games, workers, policy_name, seed, max_pieces=None):
+    # several chunks of games per worker, so that the workers that get shorter
+    # games do not wait for the others
+    chunk = max(1, games // (workers * 4))
+    starts = list(range(0, games, chunk))
+    stops = starts[1:] + [games]
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(workers) as executor:
+        chunks = list(executor.map(
+            play_games, [policy_name] * len(starts), [seed] * len(starts), starts,
+            stops, [max_pieces] * len(starts)))
+    elapsed = time.perf_counter() - start_time
+    results = {column: np.concatenate([c[column] for c in chunks]) if chunks
+               else np.zeros(0, dtype=np.int64) for column in COLUMNS}
+    return results, elapsed
+
+
+# Function that plays the same games with 1, 2, 4, ... and all the cores as the
+# workers, and prints how fast they are played
+def print_scaling(games, policy_name, seed, max_pieces=None):
+    cores = os.cpu_count() or 1
+    counts = sorted({2 ** i for i in range(cores.bit_length()) if 2 ** i <= cores} |
+                    {cores})
+    base = None
+    for workers in counts:
+        results, elapsed = run(games, workers, policy_name, seed, max_pieces)
+        if base is None:
+            base = elapsed
+        print('%2d workers: %d games in %.2f s (%.1f games/s, %.0f locks/s), '
+              'speedup %.2f' % (workers, games, elapsed, games / elapsed,
+                                results['pieces_placed'].sum() / elapsed,
+                                base / elapsed))
+
+
+# Function that converts a command line argument to a positive int (used as
+# an argparse type)
+def positive_int(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError('%r is not a positive integer' % text)
+    return value
+
+
+# Function for running the games with the command line arguments
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Play headless games of Tetris 2048 on a pool of processes.')
+    parser.add_argument('--games', type=positive_int, default=100,
+                        help='number of the games to play')
+    parser.add_argument('--workers', type=positive_int, default=os.cpu_count() or 1,
+                        help='number of the worker processes')
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='random',
+                        help='policy that plays the games')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='seed of the run (a random seed if not given)')
+    parser.add_argument('--max-pieces', type=positive_int, default=1000,
+                        help='number of the pieces after which a game is stopped')
+    parser.add_argument('--output', default='self_play.npz',
+                        help='.npz file for the columns of the results')
+    parser.add_argument('--scaling', action='store_true',
+                        help='print how the speed scales with the number of workers')
+    args = parser.parse_args(argv)
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+    if args.scaling:
+        print_scaling(args.games, args.policy, seed, args.max_pieces)
+        return
+    results, elapsed = run(args.games, args.workers, args.policy, seed,
+                           args.max_pieces)
+    np.savez(args.output, **results)
+    print('%d games with the %s policy (seed %d) in %.2f s on %d workers: '
+          'mean score %.1f, mean pieces %.1f, largest tile %d'
+          % (args.games, args.policy, seed, elapsed, args.workers,
+             results['score'].mean(), results['pieces_placed'].mean(),
+             results['max_tile'].max()))
+    print('results written to %s' % args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -12,6 +12,7 @@ import os
 import sys
 import color
 import string
+import collections
 
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = 'hide'
 import pygame
@@ -64,6 +65,10 @@ _DEFAULT_PEN_COLOR = color.BLACK
 _DEFAULT_FONT_FAMILY = 'Helvetica'
 _DEFAULT_FONT_SIZE = 12
 
+# Maximum number of fonts and rendered texts kept in the caches.
+_FONT_CACHE_SIZE = 16
+_TEXT_CACHE_SIZE = 512
+
 _xmin = None
 _ymin = None
 _xmax = None
@@ -78,9 +83,23 @@ _penRadius = None
 _penColor = _DEFAULT_PEN_COLOR
 _keysTyped = []
 
+# Least recently used caches of the fonts, keyed by (family, size, bold),
+# and of the rendered text surfaces, keyed by the font, the string and
+# the color.
+_fontCache = collections.OrderedDict()
+_textCache = collections.OrderedDict()
+
 # Has the window been created?
 _windowCreated = False
 
+# Must the whole background canvas be copied to the window canvas on
+# the next show (e.g. because the window has been exposed)?
+_fullUpdate = True
+
+# The background canvas and the scale saved while a sprite is being
+# drawn off-screen (None otherwise).
+_spriteState = None
+
 #-----------------------------------------------------------------------
 # Begin added by Alan J. Broder
 #-----------------------------------------------------------------------
@@ -461,6 +480,43 @@ def filledPolygon(x, y):
     points.append((xScaled[0], yScaled[0]))
     pygame.draw.polygon(_surface, _pygameColor(_penColor), points, 0)
 
+def _getFont(family, size, bold=False):
+    """
+    Return the pygame font with the given family, size and boldness.
+    Looking up a system font is slow, so the most recently used fonts
+    are kept in a cache.
+    """
+    key = (family, size, bold)
+    font = _fontCache.get(key)
+    if font is not None:
+        _fontCache.move_to_end(key)
+        return font
+    font = pygame.font.SysFont(family, size, bold)
+    _fontCache[key] = font
+    if len(_fontCache) > _FONT_CACHE_SIZE:
+        _fontCache.popitem(last=False)
+    return font
+
+def _renderText(s, bold=False):
+    """
+    Return a surface with string s rendered by using the current font
+    and pen color. The most recently rendered texts are kept in a cache,
+    so that the same strings are not rasterized again in every frame.
+    """
+    c = _penColor
+    key = (_fontFamily, _fontSize, bold, s,
+        c.getRed(), c.getGreen(), c.getBlue())
+    text = _textCache.get(key)
+    if text is not None:
+        _textCache.move_to_end(key)
+        return text
+    font = _getFont(_fontFamily, _fontSize, bold)
+    text = font.render(s, 1, _pygameColor(c))
+    _textCache[key] = text
+    if len(_textCache) > _TEXT_CACHE_SIZE:
+        _textCache.popitem(last=False)
+    return text
+
 def text(x, y, s):
     """
     Draw string s on the background canvas centered at (x, y).
@@ -470,8 +526,7 @@ def text(x, y, s):
     y = float(y)
     xs = _scaleX(x)
     ys = _scaleY(y)
-    font = pygame.font.SysFont(_fontFamily, _fontSize)
-    text = font.render(s, 1, _pygameColor(_penColor))
+    text = _renderText(s)
     textpos = text.get_rect(center=(xs, ys))
     _surface.blit(text, textpos)
 
@@ -484,8 +539,7 @@ def boldText(x, y, s):
     y = float(y)
     xs = _scaleX(x)
     ys = _scaleY(y)
-    font = pygame.font.SysFont(_fontFamily, _fontSize, True)
-    text = font.render(s, 1, _pygameColor(_penColor))
+    text = _renderText(s, True)
     textpos = text.get_rect(center=(xs, ys))
     _surface.blit(text, textpos)
 
@@ -511,6 +565,96 @@ def picture(pic, x=None, y=None):
     picSurface = pic._surface # violates encapsulation
     _surface.blit(picSurface, [xs-ws/2.0, ys-hs/2.0, ws, hs])
 
+def canvasScale():
+    """
+    Return the size and the x- and y-scales of the canvas as a tuple.
+    Sprites drawn for the returned value can be reused for as long as
+    the value does not change.
+    """
+    return (_canvasWidth, _canvasHeight, _xmin, _xmax, _ymin, _ymax)
+
+def beginSprite(x=None, y=None, w=None, h=None, opaque=False):
+    """
+    Redirect the subsequent drawing to a new transparent off-screen
+    canvas that covers the rectangle of width w and height h whose
+    lower left point is (x, y), keeping the current scale. The
+    rectangle defaults to the whole canvas. If opaque is True, then
+    the off-screen canvas is black instead of transparent, which makes
+    drawing the sprite faster. Call endSprite() to get the drawing as
+    a sprite.
+    """
+    global _surface
+    global _canvasWidth
+    global _canvasHeight
+    global _xmin, _xmax, _ymin, _ymax
+    global _spriteState
+    _makeSureWindowCreated()
+    if _spriteState is not None:
+        raise Exception('A sprite is already being drawn')
+    if x is None:
+        x, y, w, h = _xmin, _ymin, _xmax - _xmin, _ymax - _ymin
+    ws = max(1, int(round(_factorX(float(w)))))
+    hs = max(1, int(round(_factorY(float(h)))))
+    _spriteState = (_surface, _canvasWidth, _canvasHeight,
+        _xmin, _xmax, _ymin, _ymax)
+    if opaque:
+        _surface = pygame.Surface((ws, hs))
+    else:
+        _surface = pygame.Surface((ws, hs), pygame.SRCALPHA)
+    _canvasWidth = ws
+    _canvasHeight = hs
+    _xmin, _xmax = float(x), float(x + w)
+    _ymin, _ymax = float(y), float(y + h)
+
+def endSprite():
+    """
+    Stop drawing off-screen, and return what has been drawn since the
+    last call of beginSprite() as a sprite that can be drawn any number
+    of times by using sprite() or sprites().
+    """
+    global _surface
+    global _canvasWidth
+    global _canvasHeight
+    global _xmin, _xmax, _ymin, _ymax
+    global _spriteState
+    if _spriteState is None:
+        raise Exception('No sprite is being drawn')
+    # Convert the sprite to the pixel format of the background canvas,
+    # which is what makes drawing it fast.
+    canvas = _spriteState[0]
+    if _surface.get_flags() & pygame.SRCALPHA:
+        sprite = _surface.convert_alpha(canvas)
+    else:
+        sprite = _surface.convert(canvas)
+    (_surface, _canvasWidth, _canvasHeight,
+        _xmin, _xmax, _ymin, _ymax) = _spriteState
+    _spriteState = None
+    return sprite
+
+def sprite(s, x=None, y=None):
+    """
+    Draw sprite s (returned by endSprite()) on the background canvas
+    centered at (x, y). x and y default to the midpoint of the
+    background canvas.
+    """
+    _makeSureWindowCreated()
+    if x is None:
+        x = (_xmax + _xmin) / 2.0
+    if y is None:
+        y = (_ymax + _ymin) / 2.0
+    xs = _scaleX(float(x))
+    ys = _scaleY(float(y))
+    _surface.blit(s, (xs - s.get_width() / 2.0, ys - s.get_height() / 2.0))
+
+def sprites(seq):
+    """
+    Draw each sprite s in seq, a sequence of (s, x, y) tuples, on the
+    background canvas centered at (x, y) by using a single batch blit.
+    """
+    _makeSureWindowCreated()
+    _surface.blits([(s, (_scaleX(x) - s.get_width() / 2.0,
+        _scaleY(y) - s.get_height() / 2.0)) for s, x, y in seq], False)
+
 def clear(c=WHITE):
     """
     Clear the background canvas to color c, where c is an
@@ -539,12 +683,36 @@ def save(f):
 
 #-----------------------------------------------------------------------
 
-def _show():
-    """
-    Copy the background canvas to the window canvas.
-    """
-    _background.blit(_surface, (0, 0))
-    pygame.display.flip()
+def _pixelRect(x, y, w, h):
+    """
+    Return the pygame rectangle of the pixels covered by the rectangle of
+    width w and height h whose lower left point is (x, y), with a margin
+    of a pixel for the rounding errors.
+    """
+    xs = _scaleX(float(x))
+    ys = _scaleY(float(y + h))
+    ws = _factorX(float(w))
+    hs = _factorY(float(h))
+    return pygame.Rect(int(xs) - 1, int(ys) - 1, int(ws) + 3, int(hs) + 3)
+
+def _show(dirty=None):
+    """
+    Copy the background canvas to the window canvas. If dirty is not
+    None, then copy only the rectangles (x, y, w, h) in dirty, each of
+    width w and height h and with its lower left point at (x, y).
+    """
+    global _fullUpdate
+    if (dirty is None) or _fullUpdate:
+        _background.blit(_surface, (0, 0))
+        pygame.display.flip()
+        _fullUpdate = False
+    elif len(dirty) > 0:
+        canvasRect = _surface.get_rect()
+        rects = [_pixelRect(x, y, w, h).clip(canvasRect)
+            for x, y, w, h in dirty]
+        for rect in rects:
+            _background.blit(_surface, rect, rect)
+        pygame.display.update(rects)
     _checkForEvents()
 
 def _showAndWaitForever():
@@ -559,29 +727,40 @@ def _showAndWaitForever():
         time.sleep(QUANTUM)
         _checkForEvents()
 
-def show(msec=float('inf')):
+def show(msec=float('inf'), dirty=None):
     """
     Copy the background canvas to the window canvas, and
     then wait for msec milliseconds. msec defaults to infinity.
+    If dirty is not None, then it is a list of the rectangles
+    (x, y, w, h) that have changed since the last call of show(),
+    each of width w and height h and with its lower left point at
+    (x, y), and only these rectangles are copied.
     """
     if msec == float('inf'):
         _showAndWaitForever()
 
     _makeSureWindowCreated()
-    _show()
+    _show(dirty)
     _checkForEvents()
+    wait(msec)
 
-    # Sleep for the required time, but check for events every
-    # QUANTUM seconds.
+def wait(msec):
+    """
+    Wait for msec milliseconds, checking for events (such as a key
+    typed) while waiting.
+    """
+    _makeSureWindowCreated()
+
+    # Sleep until the deadline, but check for events every QUANTUM
+    # seconds. The time is measured instead of adding up the sleeps,
+    # as each sleep may take longer than asked.
     QUANTUM = .01
-    sec = msec / 1000.0
-    if sec < QUANTUM:
-        time.sleep(sec)
-        return
-    secondsWaited = 0.0
-    while secondsWaited < sec:
-        time.sleep(QUANTUM)
-        secondsWaited += QUANTUM
+    deadline = time.perf_counter() + msec / 1000.0
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0.0:
+            return
+        time.sleep(min(remaining, QUANTUM))
         _checkForEvents()
 
 #-----------------------------------------------------------------------
@@ -631,8 +810,19 @@ def _checkForEvents():
     Check if any new event has occured (such as a key typed or button
     pressed).  If a key has been typed, then put that key in a queue.
     """
+    _makeSureWindowCreated()
+
+    for event in pygame.event.get():
+        _handleEvent(event)
+
+def _handleEvent(event):
+    """
+    Handle the given event.  If it is a key typed, then put that key in
+    a queue.
+    """
     global _surface
     global _keysTyped
+    global _fullUpdate
     
     #-------------------------------------------------------------------
     # Begin added by Alan J. Broder
@@ -642,30 +832,30 @@ def _checkForEvents():
     #-------------------------------------------------------------------
     # End added by Alan J. Broder
     #-------------------------------------------------------------------
-    
-    _makeSureWindowCreated()
 
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            sys.exit()
-        elif event.type == pygame.KEYDOWN:
-            _keysTyped = [pygame.key.name(event.key)] + _keysTyped
-        elif (event.type == pygame.MOUSEBUTTONUP) and \
-            (event.button == 3):
-            _saveToFile()
-            
-        #---------------------------------------------------------------
-        # Begin added by Alan J. Broder
-        #---------------------------------------------------------------
-        # Every time the mouse button is pressed, remember
-        # the mouse position as of that press.
-        elif (event.type == pygame.MOUSEBUTTONDOWN) and \
-            (event.button == 1): 
-            _mousePressed = True
-            _mousePos = event.pos                      
-        #---------------------------------------------------------------
-        # End added by Alan J. Broder
-        #---------------------------------------------------------------
+    if event.type == pygame.QUIT:
+        sys.exit()
+    elif event.type in (pygame.VIDEOEXPOSE, pygame.VIDEORESIZE):
+        # The window canvas has to be drawn again as a whole.
+        _fullUpdate = True
+    elif event.type == pygame.KEYDOWN:
+        _keysTyped = [pygame.key.name(event.key)] + _keysTyped
+    elif (event.type == pygame.MOUSEBUTTONUP) and \
+        (event.button == 3):
+        _saveToFile()
+        
+    #-------------------------------------------------------------------
+    # Begin added by Alan J. Broder
+    #-------------------------------------------------------------------
+    # Every time the mouse button is pressed, remember
+    # the mouse position as of that press.
+    elif (event.type == pygame.MOUSEBUTTONDOWN) and \
+        (event.button == 1): 
+        _mousePressed = True
+        _mousePos = event.pos                      
+    #-------------------------------------------------------------------
+    # End added by Alan J. Broder
+    #-------------------------------------------------------------------
 
 #-----------------------------------------------------------------------
 
@@ -694,6 +884,29 @@ def clearKeysTyped():
     global _keysTyped
     _keysTyped = []
 
+def waitForKeyTyped(keys=None):
+    """
+    Sleep until one of the keys in keys (or any key if keys is None) is
+    typed, and return that key.  The other events that occur while
+    waiting are handled as usual.  The queue of the keys that the user
+    typed is cleared before and after waiting.
+    """
+    global _keysTyped
+    _makeSureWindowCreated()
+    _checkForEvents()
+    _keysTyped = []
+    while True:
+        for key in reversed(_keysTyped):
+            if (keys is None) or (key in keys):
+                _keysTyped = []
+                return key
+        _keysTyped = []
+        # pygame.event.wait() sleeps until the next event occurs.
+        _handleEvent(pygame.event.wait())
+        # Draw the window canvas again if the window has been exposed.
+        if _fullUpdate:
+            _show()
+
 #-----------------------------------------------------------------------
 # Begin added by Alan J. Broder
 #-----------------------------------------------------------------------
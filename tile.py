@@ -2,13 +2,23 @@ import stddraw  # the stddraw module is used as a basic graphics library
 from color import Color  # used for coloring the tile and the number on it
 from point import Point  # used for representing the position of the tile
 import copy as cp  # the copy module is used for copying tile positions
-import math  # math module that provides mathematical functions
 
 
 # Class used for representing numbered tiles as in 2048
 class Tile:
+    # only the number and the position are stored in each Tile object
+    __slots__ = ('number', 'position')
     # Class attributes shared among all Tile objects
     # ---------------------------------------------------------------------------
+    # colors of the tiles (the same for all tiles, so they are not created for
+    # each tile)
+    background_color = Color(151, 178, 199)  # background (tile) color
+    foreground_color = Color(0, 100, 200)  # foreground (number) color
+    boundary_color = Color(187, 173, 160)  # boundary (box) color
+    ghost_color = Color(0, 0, 0)  # boundary (box) color of the ghost guide
+    cleared_color = Color(255, 255, 255)  # clear color
+    number_color = Color(255, 255, 255)  # color of the numbers from 8 and on
+    small_number_color = Color(119, 112, 101)  # color of the numbers 2 and 4
     # value used for the thickness of the boxes (boundaries) around the tiles
     boundary_thickness = 0.004  # 0.004 to default
     # font family and size used for displaying the tile number
@@ -35,28 +45,34 @@ class Tile:
         Color(0, 0, 0)
     ]
 
+    # sprite atlas of the tiles (a sprite for each number, keyed by its log2,
+    # and the 'ghost' and 'cleared' sprites) and the canvas scale that the
+    # sprites are drawn for (they are drawn again when the scale changes)
+    sprites, sprites_scale = None, None
+
     # Constructor that creates a tile at a given position with 2 as its number
     def __init__(self, position=Point(0, 0)):  # (0, 0) is the default position
         # assign the number on the tile
         self.number = 2
-        # set the colors of the tile
-        self.background_color = Color(151, 178, 199)  # background (tile) color
-        self.foreground_color = Color(0, 100, 200)  # foreground (number) color
-        self.boundary_color = Color(187, 173, 160)  # boundary (box) color
         # set the position of the tile as the given position
         self.position = Point(position.x, position.y)
 
     # Setter method for the position of the tile
     def set_position(self, position):
-        # set the position of the tile as the given position
-        self.position = cp.deepcopy(position)
-
-        # Getter method for the position of the tile
+        # set the position of the tile as the given position (by copying its
+        # coordinates, so the tile does not share the given point)
+        self.position.move(position.x, position.y)
 
+    # Getter method for the position of the tile
     def get_position(self):
-        # return the position of the tile
+        # return a copy of the position of the tile
         return cp.deepcopy(self.position)
 
+    # Read-only getter method for the position of the tile that does not copy
+    # the position (the returned point must not be changed)
+    def peek_position(self):
+        return self.position
+
         # Method for moving the tile by dx along the x axis and by dy along the y axis
 
     def move(self, dx, dy):
@@ -68,34 +84,73 @@ class Tile:
     def get_number(self):
         return self.number
 
-    # Method for drawing the tile
-    def draw(self, is_transparent=False, is_cleared=False):
+    # Method for drawing the tile (moved by dy along the y axis if given) by
+    # using the pre-drawn sprite of its number
+    def draw(self, is_transparent=False, is_cleared=False, dy=0):
+        sprite = Tile.get_sprite(self.number, is_transparent, is_cleared)
+        stddraw.sprite(sprite, self.position.x, self.position.y + dy)
+
+    # Method that returns the sprite of a tile with the given number (or the
+    # sprite of a ghost or a cleared tile)
+    @classmethod
+    def get_sprite(cls, number, is_transparent=False, is_cleared=False):
+        sprites = cls.get_sprites()
+        if is_transparent:
+            return sprites['ghost']
+        if is_cleared:
+            return sprites['cleared']
+        return sprites[number.bit_length() - 1]
+
+    # Method that returns the sprite atlas of the tiles, drawing all the
+    # sprites only when it is called for the first time for a canvas scale
+    @classmethod
+    def get_sprites(cls):
+        scale = stddraw.canvasScale()
+        if cls.sprites is None or cls.sprites_scale != scale:
+            cls.sprites = {}
+            for exponent in range(1, len(cls.colors) + 1):
+                cls.sprites[exponent] = cls.draw_sprite(1 << exponent)
+            cls.sprites['ghost'] = cls.draw_sprite(2, is_transparent=True)
+            cls.sprites['cleared'] = cls.draw_sprite(2, is_cleared=True)
+            cls.sprites_scale = scale
+        return cls.sprites
+
+    # Method for drawing the sprite of a tile with the given number (or of a
+    # ghost or a cleared tile) off-screen
+    @classmethod
+    def draw_sprite(cls, number, is_transparent=False, is_cleared=False):
+        half_size = 0.525 if is_cleared else 0.5
+        stddraw.beginSprite(-half_size, -half_size, 2 * half_size, 2 * half_size)
+        cls.draw_shape(number, 0, 0, is_transparent, is_cleared)
+        return stddraw.endSprite()
+
+    # Method for drawing a tile with the given number centered at (x, y)
+    @classmethod
+    def draw_shape(cls, number, x, y, is_transparent=False, is_cleared=False):
         if is_transparent:
-            self.boundary_color = Color(0, 0, 0)  # boundary (box) color
-            stddraw.setPenColor(self.boundary_color)
-            stddraw.setPenRadius(Tile.boundary_thickness)
-            stddraw.square(self.position.x, self.position.y, 0.5)  # 0.5 to default
+            stddraw.setPenColor(cls.ghost_color)
+            stddraw.setPenRadius(cls.boundary_thickness)
+            stddraw.square(x, y, 0.5)  # 0.5 to default
             stddraw.setPenRadius()  # reset the pen radius to its default value
             return
         if is_cleared:
-            self.boundary_color = Color(255, 255, 255)  # clear color
-            stddraw.setPenColor(self.boundary_color)
-            stddraw.setPenRadius(Tile.boundary_thickness)
-            stddraw.filledSquare(self.position.x, self.position.y, 0.525)  # 0.5 to default
+            stddraw.setPenColor(cls.cleared_color)
+            stddraw.setPenRadius(cls.boundary_thickness)
+            stddraw.filledSquare(x, y, 0.525)  # 0.5 to default
             stddraw.setPenRadius()  # reset the pen radius to its default value
             return
         # draw the tile as a filled square
-        stddraw.setPenColor(self.colors[int(math.log2(self.get_number() - 1))])
-        stddraw.filledSquare(self.position.x, self.position.y, 0.5)  # 0.5 to default
+        stddraw.setPenColor(cls.colors[number.bit_length() - 2])
+        stddraw.filledSquare(x, y, 0.5)  # 0.5 to default
         # draw the bounding box of the tile as a square
-        stddraw.setPenColor(self.boundary_color)
-        stddraw.setPenRadius(Tile.boundary_thickness)
-        stddraw.square(self.position.x, self.position.y, 0.5)  # 0.5 to default
+        stddraw.setPenColor(cls.boundary_color)
+        stddraw.setPenRadius(cls.boundary_thickness)
+        stddraw.square(x, y, 0.5)  # 0.5 to default
         stddraw.setPenRadius()
         # draw the number on the tile
-        stddraw.setPenColor(Color(255, 255, 255))
-        if self.get_number() <= 4:
-            stddraw.setPenColor(Color(119, 112, 101))
-        stddraw.setFontFamily(Tile.font_family)
-        stddraw.setFontSize(Tile.font_size)
-        stddraw.boldText(self.position.x, self.position.y, str(self.get_number()))
+        stddraw.setPenColor(cls.number_color)
+        if number <= 4:
+            stddraw.setPenColor(cls.small_number_color)
+        stddraw.setFontFamily(cls.font_family)
+        stddraw.setFontSize(cls.font_size)
+        stddraw.boldText(x, y, str(number))